@@ -0,0 +1,143 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from ecommerce.models import Order
+
+CATALOG = 'catalog'
+SALES = 'sales'
+
+
+def _initial_version():
+    # Versions start from the clock rather than 1 so a version key that was
+    # evicted can never come back at a value older entries were stored under.
+    return time.time_ns() // 1000
+
+
+def get_version(namespace):
+    key = f'{namespace}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """
+    Invalidate every response cached under `namespace`. Old entries are not
+    deleted, they simply stop being addressed and expire on their own.
+    """
+    key = f'{namespace}:version'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def _count(namespace, outcome):
+    key = f'{namespace}:stats:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_stats(namespace):
+    hits = cache.get(f'{namespace}:stats:hits', 0)
+    misses = cache.get(f'{namespace}:stats:misses', 0)
+    total = hits + misses
+    return {
+        "version": get_version(namespace),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+    }
+
+
+def normalize_params(query_params):
+    """
+    Turn a QueryDict into a stable string: keys sorted and keys with only
+    empty values dropped, so `?b=2&a=1` and `?a=1&b=2&c=` share one cache
+    entry. Repeated values keep their order, since filters that read a
+    single value use the last one.
+    """
+    items = []
+    for key in sorted(query_params.keys()):
+        values = query_params.getlist(key)
+        if any(value != '' for value in values):
+            items.extend(f'{key}={value}' for value in values)
+    return '&'.join(items)
+
+
+def response_cache_key(namespace, request, *parts):
+    raw = '|'.join([request.path, normalize_params(request.query_params), *map(str, parts)])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{digest}'
+
+
+class CachedResponseMixin:
+    """
+    Serves GET responses of the listed actions from the cache. Entries are
+    keyed by the namespace version, so bumping the version (see
+    api/signals.py) retires all of them at once.
+    """
+    cache_namespace = CATALOG
+    cached_actions = ('list', 'retrieve')
+
+    def get_cache_timeout(self):
+        return settings.CATALOG_CACHE_TIMEOUT
+
+    def cached_response(self, request, build_response):
+        if request.method != 'GET':
+            return build_response()
+
+        key = response_cache_key(self.cache_namespace, request, self.action)
+        data = cache.get(key)
+        if data is not None:
+            _count(self.cache_namespace, 'hits')
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        _count(self.cache_namespace, 'misses')
+        response = build_response()
+        if response.status_code == 200:
+            cache.set(key, response.data, self.get_cache_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.cached_actions:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.cached_actions:
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+
+def order_summary_key(user_id):
+    return f'order-summary:{user_id}'
+
+
+def get_order_summary(user):
+    """
+    The user's order count, lifetime spend and last order date, cached until
+    their next order.
+    """
+    key = order_summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = Order.objects.filter(owner=user).summary()
+        cache.set(key, summary, settings.ORDER_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_order_summary(user_id):
+    cache.delete(order_summary_key(user_id))
@@ -0,0 +1,229 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Case, When, F, Sum, IntegerField
+from django.utils.timezone import now
+
+from ecommerce.models import Product, Cart, Order, OrderItem, InventoryReservation
+from .cache import CATALOG, bump_version
+from .rollups import record_order
+from .outbox import queue_mail
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    def __init__(self):
+        super().__init__("Cart is empty or invalid.")
+
+
+class InsufficientInventory(CheckoutError):
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        super().__init__(" ".join(
+            f"Not enough inventory for product '{product.name}'. "
+            f"Available: {available}, Requested: {requested}"
+            for product, available, requested in shortfalls
+        ))
+
+
+def required_quantities(cart_items):
+    quantities = Counter()
+    for cart_item in cart_items:
+        quantities[cart_item.product_id] += cart_item.quantity
+    return quantities
+
+
+def held_quantities(product_ids, exclude_cart=None):
+    """
+    Units of each product held by unexpired reservations, summed in one
+    query over the (product, expires_at) index.
+    """
+    reservations = InventoryReservation.objects.active().filter(product_id__in=product_ids)
+    if exclude_cart is not None:
+        reservations = reservations.exclude(cart=exclude_cart)
+    return dict(
+        reservations.order_by().values('product').annotate(held=Sum('quantity')).values_list('product', 'held')
+    )
+
+
+def lock_available(quantities, cart=None):
+    """
+    Lock the products in `quantities` (product id -> units) and check that
+    each has enough stock left once other carts' holds are taken out.
+
+    Must run inside a transaction. The product rows are locked in primary key
+    order, so concurrent checkouts queue up instead of deadlocking, and every
+    shortfall is reported at once. Returns the locked products by id.
+    """
+    products = Product.objects.select_for_update().only('id', 'name', 'price', 'inventory').order_by(
+        'pk'
+    ).in_bulk(list(quantities))
+    held = held_quantities(list(quantities), exclude_cart=cart)
+
+    shortfalls = []
+    for product_id, requested in quantities.items():
+        available = max(products[product_id].inventory - held.get(product_id, 0), 0)
+        if available < requested:
+            shortfalls.append((products[product_id], available, requested))
+    if shortfalls:
+        raise InsufficientInventory(shortfalls)
+    return products
+
+
+def reserve_cart(cart):
+    """
+    Hold the stock of every cart item for INVENTORY_RESERVATION_TIMEOUT
+    seconds, replacing any holds the cart already had.
+    """
+    with transaction.atomic():
+        cart_items = list(cart.items.all())
+        if not cart_items:
+            raise EmptyCart()
+
+        lock_available(required_quantities(cart_items), cart=cart)
+
+        expires_at = now() + timedelta(seconds=settings.INVENTORY_RESERVATION_TIMEOUT)
+        cart.reservations.all().delete()
+        return InventoryReservation.objects.bulk_create([
+            InventoryReservation(
+                cart=cart,
+                product_id=cart_item.product_id,
+                size=cart_item.size,
+                quantity=cart_item.quantity,
+                expires_at=expires_at
+            )
+            for cart_item in cart_items
+        ])
+
+
+def release_cart(cart):
+    return cart.reservations.all().delete()[0]
+
+
+def release_expired(batch_size=1000):
+    """
+    Delete expired reservations in batches of `batch_size`, each in its own
+    short statement. Returns the number released.
+    """
+    released = 0
+    while True:
+        batch = list(InventoryReservation.objects.expired().values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return released
+        released += InventoryReservation.objects.filter(pk__in=batch).delete()[0]
+
+
+def decrement_inventory(quantities, cart=None):
+    """
+    Take `quantities` (product id -> units) out of stock with a single UPDATE.
+    Holds of `cart` are not counted against it, the units were set aside for
+    this purchase.
+    """
+    products = lock_available(quantities, cart=cart)
+
+    Product.objects.filter(pk__in=list(quantities)).update(inventory=Case(
+        *[When(pk=product_id, then=F('inventory') - requested) for product_id, requested in quantities.items()],
+        output_field=IntegerField(),
+    ))
+    # update() skips post_save, so retire the cached catalog (stock counts) explicitly
+    transaction.on_commit(lambda: bump_version(CATALOG))
+    return products
+
+
+def notify_admin(order):
+    queue_mail(
+        subject='New Order',
+        message=f'User {order.owner.email} made an order of total amount of ₦{order.total_price}, '
+                f'order ID is {order.id}. Link to order: '
+                f'https://asluxuryoriginals.com/orders/',
+        from_email=settings.EMAIL_HOST_USER,
+        recipient_list=[settings.EMAIL_HOST_USER],
+    )
+
+
+def find_order(transaction_id):
+    """
+    The order already placed for a gateway transaction, if any. A single
+    lookup on the unique transaction_id index.
+    """
+    return Order.objects.only('id', 'owner_id', 'transaction_id').filter(transaction_id=transaction_id).first()
+
+
+def place_order(cart, user, transaction_id):
+    """
+    Turn a paid cart into an Order: take the stock, copy the lines at the
+    current prices and delete the cart, all in one transaction. Any
+    shortfall raises InsufficientInventory and rolls the whole order back.
+
+    Placing the same transaction twice returns the first order; when two
+    confirmations race, the loser hits the unique transaction_id index,
+    rolls back and gets the winner's order.
+    """
+    try:
+        with transaction.atomic():
+            cart_items = list(cart.items.all())
+            if not cart_items:
+                raise EmptyCart()
+
+            # inserted first so a concurrent duplicate stops at the unique
+            # index before it takes any product locks
+            order = Order.objects.create(
+                owner=user,
+                address=cart.address,
+                state=cart.state,
+                city=cart.city,
+                postal_code=cart.postal_code,
+                transaction_id=transaction_id
+            )
+            products = decrement_inventory(required_quantities(cart_items), cart=cart)
+
+            order_items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    owner=user,
+                    order=order,
+                    product=products[cart_item.product_id],
+                    quantity=cart_item.quantity,
+                    price=products[cart_item.product_id].price,
+                    size=cart_item.size
+                )
+                for cart_item in cart_items
+            ])
+            order.update_total_price()
+            record_order(order, order_items)
+
+            # deleting the cart also drops its reservations, the stock is now taken
+            cart.delete()
+            notify_admin(order)
+    except IntegrityError:
+        order = find_order(transaction_id)
+        if order is None:
+            raise
+    return order
+
+
+def confirm_order(cart_id, user, transaction_id):
+    """
+    Place the order for a successful payment of the cart `cart_id`, at most
+    once per transaction. Repeats return the existing order straight from
+    the transaction_id lookup, without loading the cart or locking anything.
+    """
+    order = find_order(transaction_id)
+    if order is not None:
+        return order
+
+    cart = Cart.objects.filter(id=cart_id, owner=user).first()
+    try:
+        if cart is None:
+            raise EmptyCart()
+        return place_order(cart, user, transaction_id)
+    except EmptyCart:
+        # a concurrent confirmation of the same payment may have just used the cart up
+        order = find_order(transaction_id)
+        if order is None:
+            raise
+        return order
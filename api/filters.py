@@ -1,6 +1,12 @@
 from django_filters import DateFilter, NumberFilter
 from django_filters.rest_framework import FilterSet, CharFilter, NumberFilter, BooleanFilter
-from ecommerce.models import Product, Order
+from django.db.models import Exists, OuterRef
+from rest_framework.filters import SearchFilter
+from datetime import timedelta
+from ecommerce.models import Product, Order, ProductVariantValue, DailySales
+from .rollups import start_of_day
+from .search import get_search_backend
+from .variants import normalize
 
 
 class ProductFilter(FilterSet):
@@ -9,6 +15,9 @@ class ProductFilter(FilterSet):
     subcategory_id = NumberFilter(field_name='subcategory__id', lookup_expr='exact')
     subcategory_name = CharFilter(field_name='subcategory__title', lookup_expr='exact')
     discount = BooleanFilter(field_name='discount')
+    # comma separated, e.g. ?colour=red,blue matches products in either colour
+    colour = CharFilter(field_name=ProductVariantValue.COLOUR, method='filter_variant')
+    size = CharFilter(field_name=ProductVariantValue.SIZE, method='filter_variant')
 
     class Meta:
         model = Product
@@ -17,15 +26,64 @@ class ProductFilter(FilterSet):
             'undiscounted_price': ['gt', 'lt'],  
         }
 
+    def filter_variant(self, queryset, name, value):
+        values = [normalize(item) for item in value.split(',') if item.strip()]
+        if not values:
+            return queryset
+        return queryset.filter(Exists(
+            ProductVariantValue.objects.filter(product=OuterRef('pk'), kind=name, value__in=values)
+        ))
+
+
+# bounds of a real date, so the dashboard can build the selected range from them
+MONTH = {'min_value': 1, 'max_value': 12, 'decimal_places': 0}
+YEAR = {'min_value': 1, 'max_value': 9999, 'decimal_places': 0}
+
 
 class OrderFilter(FilterSet):
-    month = NumberFilter(field_name='placed_at', lookup_expr='month')
-    year = NumberFilter(field_name='placed_at', lookup_expr='year')
-    start_date = DateFilter(field_name='placed_at', lookup_expr='gte')
-    end_date = DateFilter(field_name='placed_at', lookup_expr='lte')
+    month = NumberFilter(field_name='placed_at', lookup_expr='month', **MONTH)
+    year = NumberFilter(field_name='placed_at', lookup_expr='year', **YEAR)
+    # both ends are whole days, matching the daily rollups
+    start_date = DateFilter(field_name='placed_at', method='filter_start_date')
+    end_date = DateFilter(field_name='placed_at', method='filter_end_date')
     id = NumberFilter(field_name='id')
     class Meta:
         model = Order
         fields = ['id', 'month', 'year', 'start_date', 'end_date']
 
+    def filter_start_date(self, queryset, name, value):
+        return queryset.filter(**{f'{name}__gte': start_of_day(value)})
+
+    def filter_end_date(self, queryset, name, value):
+        return queryset.filter(**{f'{name}__lt': start_of_day(value + timedelta(days=1))})
+
+
+class DailySalesFilter(FilterSet):
+    """
+    OrderFilter's date filters, applied to the daily rollups.
+    """
+    month = NumberFilter(field_name='date', lookup_expr='month', **MONTH)
+    year = NumberFilter(field_name='date', lookup_expr='year', **YEAR)
+    start_date = DateFilter(field_name='date', lookup_expr='gte')
+    end_date = DateFilter(field_name='date', lookup_expr='lte')
+
+    class Meta:
+        model = DailySales
+        fields = ['month', 'year', 'start_date', 'end_date']
+
+
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    `?search=` backed by the configured product search backend instead of
+    icontains scans. Matches are ranked by relevance unless the client asks
+    for an explicit `ordering`.
+    """
 
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset = get_search_backend().search(queryset, query)
+        return queryset.order_by('-relevance', *queryset.query.order_by)
@@ -0,0 +1,221 @@
+import logging
+import random
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+# gateway replies that say "try again later" rather than "your request is wrong"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def connection_not_opened(err):
+    """
+    True when `err` means the request never left: the connection timed out,
+    was refused or the host did not resolve. Resets and read timeouts on an
+    open connection are not included, the gateway may have acted on those.
+    """
+    if isinstance(err, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(err, requests.exceptions.ConnectionError) and err.args:
+        return isinstance(getattr(err.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+class GatewayError(Exception):
+    pass
+
+
+class GatewayUnavailable(GatewayError):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Payment gateway is unavailable, retry in {retry_after:.0f}s.")
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast once the gateway has failed `failure_threshold` times in
+    a row. After `reset_timeout` seconds a single trial call is let through:
+    success closes the circuit again, failure re-opens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def before_call(self):
+        with self.lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return
+            retry_after = self.reset_timeout - (time.monotonic() - self.opened_at)
+            raise GatewayUnavailable(max(retry_after, 0))
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning("Payment gateway circuit opened after %d failures", self.failures)
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class LatencyMetrics:
+    """
+    Per-endpoint call counts, failures and latency of this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def record(self, name, seconds, outcome):
+        with self.lock:
+            stats = self.calls.setdefault(name, {'calls': 0, 'failures': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            if outcome != 'ok':
+                stats['failures'] += 1
+            stats['total_ms'] += seconds * 1000
+            stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    'calls': stats['calls'],
+                    'failures': stats['failures'],
+                    'avg_ms': round(stats['total_ms'] / stats['calls'], 1),
+                    'max_ms': round(stats['max_ms'], 1),
+                }
+                for name, stats in self.calls.items()
+            }
+
+
+class FlutterwaveClient:
+    """
+    Thread-safe Flutterwave API client sharing one keep-alive connection pool
+    per process.
+
+    Every call is bounded by (connect, read) timeouts. Idempotent calls are
+    retried on connection errors and 429/5xx replies with full-jitter
+    exponential backoff; other calls are only retried when the connection
+    could not be opened, since the gateway never saw them.
+    """
+
+    def __init__(self, base_url, secret_key, connect_timeout=3.05, read_timeout=10, max_retries=2,
+                 backoff=0.3, failure_threshold=5, reset_timeout=30, pool_size=10):
+        self.base_url = base_url.rstrip('/')
+        self.secret_key = secret_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = LatencyMetrics()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Authorization'] = f"Bearer {secret_key}"
+
+    def request(self, method, path, idempotent=None, name=None, **kwargs):
+        """
+        Send a request and return the `requests.Response`. Raises
+        GatewayUnavailable while the circuit is open and GatewayError when
+        the gateway could not be reached. Latency is recorded under `name`,
+        the path by default.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        name = f"{method} {name or path}"
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as err:
+                self._record(name, started, 'error')
+                self.breaker.record_failure()
+                retryable = idempotent or connection_not_opened(err)
+                if retryable and attempt < self.max_retries:
+                    attempt += 1
+                    self._sleep(attempt)
+                    continue
+                raise GatewayError(f"Payment gateway request failed: {err}") from err
+
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._record(name, started, 'ok' if response.status_code < 500 else 'server_error')
+
+            if idempotent and response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                attempt += 1
+                self._sleep(attempt)
+                continue
+            return response
+
+    def _sleep(self, attempt):
+        time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+    def _record(self, name, started, outcome):
+        elapsed = time.monotonic() - started
+        self.metrics.record(name, elapsed, outcome)
+        logger.info("Flutterwave %s took %.0fms (%s)", name, elapsed * 1000, outcome)
+
+    def create_payment(self, data):
+        return self.request('POST', '/payments', json=data)
+
+    def verify_transaction(self, transaction_id):
+        return self.request('GET', f'/transactions/{transaction_id}/verify', name='/transactions/:id/verify')
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    return FlutterwaveClient(
+        settings.FLW_BASE_URL,
+        settings.FLW_SEC_KEY,
+        connect_timeout=settings.FLW_CONNECT_TIMEOUT,
+        read_timeout=settings.FLW_READ_TIMEOUT,
+        max_retries=settings.FLW_MAX_RETRIES,
+        failure_threshold=settings.FLW_CIRCUIT_FAILURES,
+        reset_timeout=settings.FLW_CIRCUIT_RESET,
+    )
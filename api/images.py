@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FIELDS = ['image1', 'image2', 'image3', 'image4', 'image5']
+# longest edge in pixels; images are only ever scaled down
+VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 1200,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_DIR = 'products/images/variants/'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants'
+            )
+        return _executor
+
+
+def variant_name(name, variant, extension):
+    base = os.path.splitext(os.path.basename(name))[0]
+    return f"{VARIANT_DIR}{base}_{variant}.{extension}"
+
+
+def variant_urls(name):
+    return {
+        variant: {extension: default_storage.url(variant_name(name, variant, extension)) for extension in FORMATS}
+        for variant in VARIANTS
+    }
+
+
+def _flatten_alpha(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(name, force=False):
+    """
+    Write every size/format variant of the stored image `name`. Variants that
+    already exist are kept unless `force` is set. Returns the number written.
+    """
+    pending = [
+        (variant, extension) for variant in VARIANTS for extension in FORMATS
+        if force or not default_storage.exists(variant_name(name, variant, extension))
+    ]
+    if not pending:
+        return 0
+
+    with default_storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image = _flatten_alpha(ImageOps.exif_transpose(image))
+
+    written = 0
+    for variant, extension in pending:
+        edge = VARIANTS[variant]
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+
+        image_format, options = FORMATS[extension]
+        buffer = BytesIO()
+        resized.save(buffer, image_format, **options)
+
+        path = variant_name(name, variant, extension)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        default_storage.save(path, ContentFile(buffer.getvalue()))
+        written += 1
+    return written
+
+
+def delete_variants(name):
+    for variant in VARIANTS:
+        for extension in FORMATS:
+            path = variant_name(name, variant, extension)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+
+
+def _run(task, name, *args):
+    try:
+        return task(name, *args)
+    except Exception:
+        logger.exception("Image variant task %s failed for %s", task.__name__, name)
+        raise
+
+
+def schedule_variants(names, force=False):
+    """
+    Queue variant generation on the worker pool, off the request path.
+    """
+    executor = get_executor()
+    return [executor.submit(_run, generate_variants, name, force) for name in names]
+
+
+def schedule_deletion(names):
+    executor = get_executor()
+    return [executor.submit(_run, delete_variants, name) for name in names]
+
+
+def product_images(product):
+    return [field.name for field in (getattr(product, name) for name in IMAGE_FIELDS) if field]
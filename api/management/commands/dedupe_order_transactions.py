@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+
+from api.cache import CATALOG, bump_version
+from ecommerce.models import Order, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "List orders sharing a transaction_id, which keep the unique index on Order.transaction_id "
+        "from being created, and with --fix resolve them. Run before applying that migration."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help="Delete repeat placements of a payment (restocking their items) and rename the other duplicates.",
+        )
+
+    def handle(self, *args, **options):
+        duplicated = list(
+            Order.objects.order_by('transaction_id').values('transaction_id')
+            .annotate(orders=Count('id')).filter(orders__gt=1).values_list('transaction_id', flat=True)
+        )
+        deleted = renamed = 0
+        for transaction_id in duplicated:
+            with transaction.atomic():
+                kept, *others = Order.objects.select_for_update().filter(transaction_id=transaction_id).order_by('pk')
+                for order in others:
+                    # the same shopper's payment placed twice, and not shipped: the copy never sold anything
+                    repeat = transaction_id and order.owner_id == kept.owner_id and not order.delivered
+                    action = "delete" if repeat else "rename"
+                    self.stdout.write(f"Order {order.pk} repeats transaction {transaction_id!r} "
+                                      f"of order {kept.pk}: {action}")
+                    if not options['fix']:
+                        continue
+                    if repeat:
+                        self.restock(order)
+                        order.delete()
+                        deleted += 1
+                    else:
+                        order.transaction_id = f'{transaction_id}-duplicate-{order.pk}'[-200:]
+                        order.save(update_fields=['transaction_id'])
+                        renamed += 1
+
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Found {len(duplicated)} duplicated transactions. Deleted {deleted} orders, renamed {renamed}."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Found {len(duplicated)} duplicated transactions."))
+
+    def restock(self, order):
+        for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+            Product.objects.filter(pk=product_id).update(inventory=F('inventory') + quantity)
+        transaction.on_commit(lambda: bump_version(CATALOG))
@@ -0,0 +1,30 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from api.images import IMAGE_FIELDS, product_images, schedule_variants
+from ecommerce.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate the resized WebP/JPEG variants of existing product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate variants that already exist.")
+
+    def handle(self, *args, **options):
+        names = []
+        for product in Product.objects.only('id', *IMAGE_FIELDS).order_by('id').iterator(chunk_size=500):
+            names.extend(product_images(product))
+
+        written = failed = 0
+        for future in as_completed(schedule_variants(names, force=options['force'])):
+            try:
+                written += future.result()
+            except Exception as err:
+                failed += 1
+                self.stderr.write(str(err))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(names)} images: {written} variants written, {failed} failed."
+        ))
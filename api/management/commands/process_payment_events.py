@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.payments import process_pending
+
+
+class Command(BaseCommand):
+    help = "Process pending payment gateway events. Runs once, or keeps polling with --interval."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Seconds to sleep between passes; 0 runs a single pass.")
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_pending(batch_size=options['batch_size'])
+            if handled or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f"Processed {handled} payment events."))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
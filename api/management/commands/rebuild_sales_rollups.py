@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min, Max
+from django.utils.timezone import localdate
+
+from api.rollups import rebuild
+from ecommerce.models import Order
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from the orders, a chunk of days at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First day (YYYY-MM-DD), default the first order.")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day (YYYY-MM-DD), default the last order.")
+        parser.add_argument('--chunk-days', type=int, default=31)
+
+    def handle(self, *args, **options):
+        bounds = Order.objects.aggregate(first=Min('placed_at'), last=Max('placed_at'))
+        if bounds['first'] is None and not (options['start'] and options['end']):
+            self.stdout.write("No orders to roll up.")
+            return
+
+        start = options['start'] or localdate(bounds['first'])
+        end = options['end'] or localdate(bounds['last'])
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+
+        days = rebuild(start, end, chunk_days=options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups from {start} to {end}: {days} days with orders."))
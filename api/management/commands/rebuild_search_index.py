@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.search import FIELD_WEIGHTS, get_search_backend
+from ecommerce.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        backend = get_search_backend()
+        backend.clear()
+
+        products = Product.objects.only('id', *FIELD_WEIGHTS).order_by('id')
+        chunk, total = [], 0
+        for product in products.iterator(chunk_size=chunk_size):
+            chunk.append(product)
+            if len(chunk) == chunk_size:
+                backend.index_many(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            backend.index_many(chunk)
+            total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.models import Order
+
+
+class Command(BaseCommand):
+    help = "Check every order's total_price against its items and, with --fix, repair the ones that differ."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--fix', action='store_true', help="Write the recomputed totals.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checked, mismatched, last_pk = 0, 0, 0
+
+        while True:
+            chunk = list(
+                Order.objects.filter(pk__gt=last_pk).order_by('pk').with_items_total()
+                .values_list('pk', 'total_price', 'items_total')[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            checked += len(chunk)
+
+            wrong = [Order(pk=pk, total_price=items_total) for pk, total_price, items_total in chunk
+                     if total_price != items_total]
+            mismatched += len(wrong)
+            for order in wrong:
+                self.stdout.write(f"Order {order.pk}: total should be {order.total_price}")
+            if wrong and options['fix']:
+                Order.objects.bulk_update(wrong, ['total_price'])
+
+        verb = "Repaired" if options['fix'] else "Found"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} orders. {verb} {mismatched} wrong totals."))
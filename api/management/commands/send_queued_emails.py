@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox. Runs once, or keeps polling with --interval."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Seconds to sleep between passes; 0 runs a single pass.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_pending(batch_size=options['batch_size'])
+            if sent or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f"Sent {sent} queued emails."))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.variants import VARIANT_FIELDS, sync_variants
+from ecommerce.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the colour/size lookup rows from the products' JSON fields."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        products = Product.objects.only('id', *VARIANT_FIELDS).order_by('id')
+
+        chunk, total = [], 0
+        for product in products.iterator(chunk_size=chunk_size):
+            chunk.append(product)
+            if len(chunk) == chunk_size:
+                sync_variants(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            sync_variants(chunk)
+            total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Synced variants of {total} products."))
@@ -0,0 +1,107 @@
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_CLAUSE = re.compile(r"IN \((?:%s, )*%s\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def normalize_sql(sql):
+    """
+    Reduce a statement to its shape so the same query with different
+    parameters (or a different number of IN values) is counted together.
+    """
+    sql = WHITESPACE.sub(' ', sql).strip()
+    return IN_CLAUSE.sub('IN (...)', sql)
+
+
+def get_query_budget(view_func, method):
+    """
+    Look up the budget a view declares for the action serving `method`.
+
+    Views declare budgets as a ``query_budget`` mapping of action name to the
+    maximum number of queries, e.g. ``{'list': 3, 'retrieve': 2}``. Plain
+    APIViews key the mapping by lowercase HTTP method instead.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    budget = getattr(view_class, 'query_budget', None)
+    if not budget:
+        return None, None
+
+    method = method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method, method)
+    return action, budget.get(action)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.shapes[normalize_sql(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        return [(sql, times) for sql, times in self.shapes.most_common() if times >= threshold]
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the SQL run while serving each request, compares it against the
+    budget declared by the view and reports statements repeated with
+    different parameters (the usual sign of an N+1 pattern).
+
+    Breaches are logged; with QUERY_BUDGET_STRICT enabled they raise
+    QueryBudgetExceeded instead so a test run fails loudly.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+        self.repeat_threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+
+        self.report(request, counter)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(counter.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request.method)
+
+    def report(self, request, counter):
+        action, budget = getattr(request, 'query_budget', (None, None))
+
+        for sql, times in counter.repeated(self.repeat_threshold):
+            logger.warning(
+                "Possible N+1 on %s %s: statement ran %d times: %s",
+                request.method, request.path, times, sql[:300]
+            )
+
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.method} {request.path} ({action}) ran {counter.count} queries, "
+                f"budget is {budget}."
+            )
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
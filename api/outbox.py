@@ -0,0 +1,157 @@
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils.timezone import now
+
+from ecommerce.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_scheduled = False
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EMAIL_OUTBOX_WORKERS, thread_name_prefix='email-outbox'
+            )
+        return _executor
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """
+    Drop-in for send_mail(). The message is stored in the caller's
+    transaction and delivered by the outbox workers after it commits, so a
+    slow or unreachable mail server never holds up the request.
+    """
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email or '',
+        recipients=list(recipient_list),
+    )
+    transaction.on_commit(schedule_delivery)
+    return email
+
+
+def _retry_at(attempts):
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return now() + timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def claim_due(batch_size):
+    """
+    Take up to `batch_size` due messages, oldest first. The rows are locked
+    with SKIP LOCKED only long enough to push their next_attempt_at past
+    EMAIL_OUTBOX_LEASE, so other workers pass over them while they are sent
+    outside the transaction, and a worker that dies leaves them to be retried.
+    """
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+            )
+    return emails
+
+
+def _failed(email, err):
+    email.attempts += 1
+    email.error = str(err)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        logger.error("Giving up on email %s after %d attempts: %s", email.pk, email.attempts, err)
+        email.status = OutboundEmail.DEAD
+    else:
+        logger.warning("Email %s failed on attempt %d: %s", email.pk, email.attempts, err)
+        email.next_attempt_at = _retry_at(email.attempts)
+    email.save(update_fields=['attempts', 'error', 'status', 'next_attempt_at'])
+
+
+def deliver(emails, connection):
+    """
+    Send `emails` over `connection`, reopening it after an error since the
+    server may have dropped it. Returns the number sent.
+    """
+    sent = []
+    for email in emails:
+        message = EmailMessage(
+            email.subject, email.message, email.from_email or settings.DEFAULT_FROM_EMAIL,
+            email.recipients, connection=connection,
+        )
+        try:
+            # no-op while the connection is open
+            connection.open()
+            connection.send_messages([message])
+        except Exception as err:
+            _failed(email, err)
+            connection.close()
+        else:
+            sent.append(email.pk)
+    if sent:
+        OutboundEmail.objects.filter(pk__in=sent).update(
+            status=OutboundEmail.SENT, sent_at=now(), error='',
+        )
+    return len(sent)
+
+
+def send_pending(batch_size=None):
+    """
+    Send every due message in batches of `batch_size`, reusing one mail
+    server connection for the whole pass. Returns the number sent.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    connection = get_connection()
+    sent = 0
+    try:
+        while True:
+            emails = claim_due(batch_size)
+            if not emails:
+                return sent
+            sent += deliver(emails, connection)
+            if len(emails) < batch_size:
+                return sent
+    finally:
+        connection.close()
+
+
+def _run():
+    global _scheduled
+    # cleared before the pass, so messages queued while it runs schedule another one
+    with _executor_lock:
+        _scheduled = False
+    # worker threads get no request signals, so drop connections the server may have closed
+    close_old_connections()
+    try:
+        return send_pending()
+    except Exception:
+        logger.exception("Sending queued emails failed")
+        raise
+    finally:
+        close_old_connections()
+
+
+def schedule_delivery():
+    """
+    Hand the outbox to the worker pool. Requests that queue mail while a
+    pass is already waiting to start share it instead of piling up more.
+    """
+    global _scheduled
+    with _executor_lock:
+        if _scheduled:
+            return None
+        _scheduled = True
+    return get_executor().submit(_run)
@@ -0,0 +1,188 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode.
+
+    Clients switch to keyset mode with `?pagination=cursor` and then follow
+    the `next`/`previous` links. Instead of OFFSET + COUNT(*) each page seeks
+    past the ordering values of the last row it returned, so deep pages cost
+    the same as the first one. The seek uses whatever ordering the queryset
+    ends up with (including OrderingFilter's), with the primary key appended
+    as a tiebreaker.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor['r'])
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [(name, not descending) for name, descending in ordering]
+
+        queryset = queryset.order_by(*[f"-{name}" if descending else name for name, descending in ordering])
+        if cursor:
+            queryset = queryset.filter(self.seek_filter(queryset.model, ordering, cursor['v']))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self.build_link(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.rows:
+            return None
+        return self.build_link(self.rows[0], reverse=True)
+
+    def get_ordering(self, queryset):
+        ordering = []
+        for item in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(item, str):
+                raise NotFound('Cursor pagination does not support expression ordering.')
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            if name == 'pk':
+                name = queryset.model._meta.pk.name
+            ordering.append((name, descending))
+
+        pk_name = queryset.model._meta.pk.name
+        if pk_name not in [name for name, _ in ordering]:
+            # Follow the direction of the last column so one composite index
+            # can serve the whole ORDER BY.
+            ordering.append((pk_name, ordering[-1][1] if ordering else False))
+        return ordering
+
+    def seek_filter(self, model, ordering, values):
+        """
+        Rows strictly after `values` in `ordering`:
+        (a > va) OR (a = va AND b > vb) OR ...
+
+        NULLs sort lowest, as they do on MySQL and SQLite.
+        """
+        values = [self.decode_value(model, name, value) for (name, _), value in zip(ordering, values)]
+        seek = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(ordering, values):
+            seek |= equal & self.after(name, descending, value)
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        return seek
+
+    @staticmethod
+    def after(name, descending, value):
+        if value is None:
+            return Q(pk__in=[]) if descending else Q(**{f'{name}__isnull': False})
+        if descending:
+            return Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+        return Q(**{f'{name}__gt': value})
+
+    def build_link(self, row, reverse):
+        values = [self.encode_value(self.get_value(row, name)) for name, _ in self.ordering]
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(cursor['v'], list) or len(cursor['v']) != len(self.ordering):
+                raise ValueError
+            return {'v': cursor['v'], 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def get_value(row, name):
+        for part in name.split('__'):
+            row = getattr(row, part, None)
+        return row
+
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, (Decimal, datetime, date)):
+            return str(value)
+        return value
+
+    def decode_value(self, model, name, value):
+        if value is None:
+            return None
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search relevance score) are stored as-is.
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class DashboardOrderPagination(KeysetPagination):
+    """
+    Always in keyset mode: the dashboard pages through every order of a
+    date range, where OFFSET paging gets slower page by page.
+    """
+    page_size = 50
+    max_page_size = 500
+
+    def use_keyset(self, request):
+        return True
@@ -0,0 +1,206 @@
+import hmac
+import logging
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from ecommerce.models import Cart, PaymentEvent
+from .checkout import CheckoutError, confirm_order, find_order
+from .gateway import GatewayError, get_gateway
+
+logger = logging.getLogger(__name__)
+
+CHARGE_COMPLETED = 'charge.completed'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PAYMENT_EVENT_WORKERS, thread_name_prefix='payment-events'
+            )
+        return _executor
+
+
+def payment_reference(cart_id):
+    """
+    tx_ref sent to the gateway. It carries the cart id so a webhook can be
+    matched to its cart without the shopper's redirect.
+    """
+    return f"{cart_id}-{uuid.uuid4()}"
+
+
+def cart_from_reference(tx_ref):
+    cart_id, _, _ = str(tx_ref or '').partition('-')
+    return int(cart_id) if cart_id.isdigit() else None
+
+
+def verify_signature(signature):
+    """
+    Flutterwave sends the secret hash configured on the dashboard in the
+    `verif-hash` header of every webhook.
+    """
+    secret = settings.FLW_WEBHOOK_HASH
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(signature.encode(), secret.encode())
+
+
+def record_event(payload):
+    """
+    Store a verified webhook payload and hand it to the worker pool once the
+    row is committed.
+    """
+    data = payload.get('data') or {}
+    event = PaymentEvent.objects.create(
+        event_type=str(payload.get('event') or payload.get('event.type') or '')[:100],
+        transaction_id=str(data.get('id') or '')[:200],
+        payload=payload,
+    )
+    transaction.on_commit(schedule_processing)
+    return event
+
+
+def _finish(event, status, error=''):
+    event.status = status
+    event.error = error
+    event.processed_at = now()
+    event.save(update_fields=['status', 'error', 'processed_at', 'attempts'])
+
+
+def _amount(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def handle_event(event):
+    """
+    Place the order for a completed charge through the same path as
+    confirm_payment. The charge is verified with the gateway first, since
+    the webhook body alone only proves who sent it.
+    """
+    data = event.payload.get('data') or {}
+    if event.event_type != CHARGE_COMPLETED or str(data.get('status', '')).lower() != 'successful':
+        return _finish(event, PaymentEvent.IGNORED)
+    if not event.transaction_id:
+        return _finish(event, PaymentEvent.FAILED, "Event has no transaction id.")
+
+    # the redirect, or an earlier delivery of this event, may already have placed the order
+    if find_order(event.transaction_id) is not None:
+        return _finish(event, PaymentEvent.DUPLICATE)
+
+    cart = Cart.objects.with_totals().select_related('owner').filter(
+        pk=cart_from_reference(data.get('tx_ref'))
+    ).first()
+    if cart is None:
+        return _finish(event, PaymentEvent.FAILED, f"No cart for tx_ref {data.get('tx_ref')!r}.")
+
+    response = get_gateway().verify_transaction(event.transaction_id)
+    if response.status_code >= 500:
+        raise GatewayError(f"Transaction verification returned {response.status_code}.")
+    verified = (response.json().get('data') or {}) if response.status_code == 200 else {}
+    amount = _amount(verified.get('amount'))
+    if (
+        str(verified.get('status', '')).lower() != 'successful'
+        or verified.get('tx_ref') != data.get('tx_ref')
+        or amount is None or amount < cart.get_total_price()
+    ):
+        return _finish(event, PaymentEvent.FAILED, f"Gateway did not verify the charge ({response.status_code}).")
+
+    # only placing the order needs a transaction, the checks above hold no locks
+    try:
+        with transaction.atomic():
+            confirm_order(cart.pk, cart.owner, event.transaction_id)
+    except CheckoutError as err:
+        # paid but unfillable, needs a refund or a restock by hand
+        logger.error("Paid transaction %s could not be placed: %s", event.transaction_id, err)
+        return _finish(event, PaymentEvent.FAILED, str(err))
+    return _finish(event, PaymentEvent.PROCESSED)
+
+
+def claim_pending(batch_size):
+    """
+    Take up to `batch_size` due events, oldest first, and count the attempt.
+    The rows are locked with SKIP LOCKED only long enough to push their
+    next_attempt_at past PAYMENT_EVENT_LEASE, so other workers pass over
+    them while they are handled, and a worker that dies leaves them to be
+    retried.
+    """
+    with transaction.atomic():
+        events = list(
+            PaymentEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=PaymentEvent.PENDING, next_attempt_at__lte=now())
+            .order_by('id')[:batch_size]
+        )
+        if events:
+            PaymentEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                attempts=F('attempts') + 1,
+                next_attempt_at=now() + timedelta(seconds=settings.PAYMENT_EVENT_LEASE),
+            )
+    for event in events:
+        event.attempts += 1
+    return events
+
+
+def _failed(event, err):
+    if event.attempts >= settings.PAYMENT_EVENT_MAX_ATTEMPTS:
+        logger.error("Giving up on payment event %s after %d attempts: %s", event.pk, event.attempts, err)
+        return _finish(event, PaymentEvent.FAILED, str(err))
+    logger.warning("Payment event %s failed on attempt %d: %s", event.pk, event.attempts, err)
+    delay = settings.PAYMENT_EVENT_RETRY_DELAY * 2 ** (event.attempts - 1)
+    event.error = str(err)
+    event.next_attempt_at = now() + timedelta(seconds=random.uniform(delay / 2, delay))
+    event.save(update_fields=['error', 'next_attempt_at'])
+
+
+def process_pending(batch_size=20):
+    """
+    Work through due events oldest first. Each event is verified with the
+    gateway outside any transaction and only its order is placed in one, so
+    product locks are never held across a gateway call. An event that raises
+    is retried later with backoff and marked FAILED after
+    PAYMENT_EVENT_MAX_ATTEMPTS. Returns the number of events handled.
+    """
+    handled = 0
+    while True:
+        events = claim_pending(batch_size)
+        if not events:
+            return handled
+        for event in events:
+            try:
+                handle_event(event)
+            except Exception as err:
+                _failed(event, err)
+            handled += 1
+        if len(events) < batch_size:
+            return handled
+
+
+def _run():
+    # worker threads get no request signals, so drop connections the server may have closed
+    close_old_connections()
+    try:
+        return process_pending()
+    except Exception:
+        logger.exception("Processing payment events failed")
+        raise
+    finally:
+        close_old_connections()
+
+
+def schedule_processing():
+    return get_executor().submit(_run)
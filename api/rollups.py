@@ -0,0 +1,123 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, When, F, Sum, Count, Value, DecimalField, IntegerField, PositiveIntegerField
+from django.db.models.functions import Greatest, TruncDate
+from django.utils.timezone import localdate, make_aware
+
+from ecommerce.models import Order, OrderItem, DailySales, DailyProductSales, order_line_total
+from .cache import SALES, bump_version
+
+
+def start_of_day(day):
+    """
+    Midnight of `day` in TIME_ZONE, for range filters on placed_at that can
+    use its index.
+    """
+    return make_aware(datetime.combine(day, time.min))
+
+
+def _increment(field, amounts, output_field):
+    return F(field) + Case(
+        *[When(product_id=product_id, then=Value(amount)) for product_id, amount in amounts.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def _product_totals(order_items, sign=1):
+    quantities, revenues = defaultdict(int), defaultdict(Decimal)
+    for item in order_items:
+        quantities[item.product_id] += sign * item.quantity
+        revenues[item.product_id] += sign * item.quantity * item.price
+    return quantities, revenues
+
+
+def record_order(order, order_items):
+    """
+    Add a newly placed order to the rollups of its day. Rows are created
+    empty if missing and then incremented in place, so concurrent orders
+    on the same day cannot overwrite each other's counts.
+    """
+    day = localdate(order.placed_at)
+    quantities, revenues = _product_totals(order_items)
+
+    DailySales.objects.bulk_create([DailySales(date=day)], ignore_conflicts=True)
+    DailySales.objects.filter(date=day).update(
+        order_count=F('order_count') + 1,
+        revenue=F('revenue') + order.total_price,
+    )
+
+    DailyProductSales.objects.bulk_create(
+        [DailyProductSales(date=day, product_id=product_id) for product_id in quantities], ignore_conflicts=True
+    )
+    DailyProductSales.objects.filter(date=day, product_id__in=list(quantities)).update(
+        quantity=_increment('quantity', quantities, PositiveIntegerField()),
+        revenue=_increment('revenue', revenues, DecimalField(max_digits=14, decimal_places=2)),
+    )
+
+
+def forget_order(order):
+    """
+    Take a deleted order back out of the rollups of its day, with the same
+    in-place updates as record_order. Must run before the order's items are
+    deleted. Counts stop at zero, in case the rollups were never built for
+    the order.
+    """
+    day = localdate(order.placed_at)
+    quantities, revenues = _product_totals(order.items.all(), sign=-1)
+
+    DailySales.objects.filter(date=day).update(
+        order_count=Greatest(F('order_count') - 1, 0),
+        revenue=F('revenue') - order.total_price,
+    )
+    if quantities:
+        DailyProductSales.objects.filter(date=day, product_id__in=list(quantities)).update(
+            quantity=Greatest(_increment('quantity', quantities, IntegerField()), 0),
+            revenue=_increment('revenue', revenues, DecimalField(max_digits=14, decimal_places=2)),
+        )
+
+
+def rebuild(start, end, chunk_days=31):
+    """
+    Recompute the rollups of every day from `start` to `end` (inclusive)
+    from the orders, `chunk_days` days per transaction. Returns the number
+    of days that had orders.
+    """
+    days = 0
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        with transaction.atomic():
+            DailySales.objects.filter(date__range=(start, chunk_end)).delete()
+            DailyProductSales.objects.filter(date__range=(start, chunk_end)).delete()
+
+            since, until = start_of_day(start), start_of_day(chunk_end + timedelta(days=1))
+            orders = (
+                Order.objects.filter(placed_at__gte=since, placed_at__lt=until)
+                .annotate(day=TruncDate('placed_at'))
+                .order_by().values('day')
+                .annotate(orders=Count('id'), sales=Sum('total_price'))
+            )
+            daily = [
+                DailySales(date=row['day'], order_count=row['orders'], revenue=row['sales'] or 0)
+                for row in orders
+            ]
+            DailySales.objects.bulk_create(daily, batch_size=1000)
+
+            items = (
+                OrderItem.objects.filter(order__placed_at__gte=since, order__placed_at__lt=until)
+                .annotate(day=TruncDate('order__placed_at'))
+                .order_by().values('day', 'product')
+                .annotate(units=Sum('quantity'), sales=Sum(order_line_total()))
+            )
+            DailyProductSales.objects.bulk_create([
+                DailyProductSales(date=row['day'], product_id=row['product'], quantity=row['units'],
+                                  revenue=row['sales'] or 0)
+                for row in items
+            ], batch_size=1000)
+        days += len(daily)
+        start = chunk_end + timedelta(days=1)
+    bump_version(SALES)
+    return days
@@ -0,0 +1,206 @@
+import bisect
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum, Case, When, Value, IntegerField
+from django.utils.module_loading import import_string
+
+from ecommerce.models import Product, ProductSearchTerm
+
+TOKEN = re.compile(r'\w+')
+# relative weight of a term depending on the field it was found in
+FIELD_WEIGHTS = {'name': 5, 'colour': 3, 'material': 2, 'description': 1}
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN.findall(str(text).lower())
+        if MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def flatten(value):
+    """
+    Text held in a JSONField (colour may be a string, a list or a dict of
+    names to values).
+    """
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [text for item in value.items() for part in item for text in flatten(part)]
+    if isinstance(value, (list, tuple)):
+        return [text for item in value for text in flatten(item)]
+    return [str(value)]
+
+
+def product_terms(product):
+    """
+    Map each term of a product's searchable fields to its weight: the field
+    weight times the number of occurrences.
+    """
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for text in flatten(getattr(product, field)):
+            for token in tokenize(text):
+                terms[token] += weight
+    return terms
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def no_matches(queryset):
+    # still annotated, so callers can order by relevance
+    return queryset.none().annotate(relevance=Value(0, output_field=IntegerField()))
+
+
+class BaseSearchBackend:
+    """
+    Interface for product search backends.
+
+    `search` narrows a Product queryset to the matches of `query` and
+    annotates each row with an integer `relevance`; it must stay a queryset
+    so it composes with ProductFilter, ordering and pagination. Every query
+    term also matches as a prefix, so "cot" finds "cotton".
+    """
+
+    def index(self, product):
+        raise NotImplementedError
+
+    def index_many(self, products):
+        for product in products:
+            self.index(product)
+
+    def remove(self, product_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Inverted index stored in ProductSearchTerm. Matching terms are found with
+    range scans on the (term, product) index and scores are summed in the
+    same query that returns the products.
+    """
+
+    def index(self, product):
+        self.index_many([product])
+
+    def index_many(self, products):
+        rows = [
+            ProductSearchTerm(term=term, product_id=product.pk, weight=weight)
+            for product in products
+            for term, weight in product_terms(product).items()
+        ]
+        with transaction.atomic():
+            ProductSearchTerm.objects.filter(product_id__in=[product.pk for product in products]).delete()
+            ProductSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+    def remove(self, product_id):
+        ProductSearchTerm.objects.filter(product_id=product_id).delete()
+
+    def clear(self):
+        ProductSearchTerm.objects.all().delete()
+
+    def search(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return no_matches(queryset)
+
+        matches = Q()
+        for term in terms:
+            matches |= Q(search_terms__term__startswith=term)
+        return queryset.filter(matches).annotate(relevance=Sum('search_terms__weight'))
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    In-process inverted index, meant for tests and local development. Each
+    process keeps its own copy: it is built from the database on the first
+    search and then kept current by the product save/delete signals.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.loaded = False
+        self.postings = {}
+        self.documents = {}
+        self.sorted_terms = []
+
+    def load(self):
+        with self.load_lock:
+            if self.loaded:
+                return
+            self.index_many(Product.objects.only('id', *FIELD_WEIGHTS).iterator(chunk_size=500))
+            self.loaded = True
+
+    def index(self, product):
+        terms = product_terms(product)
+        with self.lock:
+            self._remove(product.pk)
+            for term, weight in terms.items():
+                if term not in self.postings:
+                    self.postings[term] = {}
+                    bisect.insort(self.sorted_terms, term)
+                self.postings[term][product.pk] = weight
+            self.documents[product.pk] = list(terms)
+
+    def remove(self, product_id):
+        with self.lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        for term in self.documents.pop(product_id, []):
+            postings = self.postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[term]
+                self.sorted_terms.remove(term)
+
+    def clear(self):
+        with self.lock:
+            self.postings, self.documents, self.sorted_terms = {}, {}, []
+
+    def scores(self, query):
+        if not self.loaded:
+            self.load()
+        scores = Counter()
+        with self.lock:
+            for term in query_terms(query):
+                start = bisect.bisect_left(self.sorted_terms, term)
+                for candidate in self.sorted_terms[start:]:
+                    if not candidate.startswith(term):
+                        break
+                    for product_id, weight in self.postings[candidate].items():
+                        scores[product_id] += weight
+        return scores
+
+    def search(self, queryset, query):
+        scores = self.scores(query)
+        if not scores:
+            return no_matches(queryset)
+        relevance = Case(
+            *[When(pk=product_id, then=Value(score)) for product_id, score in scores.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        return queryset.filter(pk__in=list(scores)).annotate(relevance=relevance)
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    return import_string(settings.PRODUCT_SEARCH_BACKEND)()
@@ -1,8 +1,91 @@
+from django.db import transaction
+from django.db.models import F, Q, Prefetch
 from rest_framework import serializers
 from ecommerce.models import *
-
-
-
+from .images import IMAGE_FIELDS, variant_urls
+
+
+def requested_fields(request, prefix=''):
+    """
+    The `?<prefix>fields=` and `?<prefix>omit=` selections as sets (None when absent).
+    """
+    def parse(name):
+        raw = request.query_params.get(prefix + name)
+        if not raw:
+            return None
+        return {field.strip() for field in raw.split(',') if field.strip()}
+
+    return parse('fields'), parse('omit')
+
+
+class SparseFieldsMixin:
+    """
+    Lets clients choose the fields they need with `?fields=a,b` or drop some
+    with `?omit=a,b`. Nested serializers take a `sparse_prefix` so they read
+    their own pair of parameters, e.g. `?product_fields=`.
+
+    `Meta.sparse_columns` maps method fields to the columns they read so
+    sparse_queryset can load only what the response needs.
+    """
+
+    def __init__(self, *args, sparse_prefix='', **kwargs):
+        self.sparse_prefix = sparse_prefix
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None:
+            return fields
+
+        only, omit = requested_fields(request, self.sparse_prefix)
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        if omit:
+            fields = {name: field for name, field in fields.items() if name not in omit}
+        return fields
+
+
+def sparse_columns(serializer):
+    """
+    Lookup paths of the model columns read by the (selected) fields of `serializer`.
+    """
+    columns = []
+    column_map = getattr(serializer.Meta, 'sparse_columns', {})
+    for name, field in serializer.fields.items():
+        if name in column_map:
+            columns.extend(column_map[name])
+        elif isinstance(field, serializers.BaseSerializer):
+            columns.extend(f"{field.source}__{column}" for column in sparse_columns(field))
+        elif field.source != '*' and not isinstance(field, serializers.SerializerMethodField):
+            columns.append(field.source)
+    return columns
+
+
+def sparse_queryset(queryset, serializer, path='', required=()):
+    """
+    Defer the columns of the serializer's model that its selected fields do
+    not read and join only the relations they do. `path` is the lookup from
+    the queryset's model to the serializer's model (e.g. 'product' for cart
+    items); `required` lists columns needed regardless of the selection,
+    such as ordering or pricing fields.
+    """
+    model = serializer.Meta.model
+    columns = set(sparse_columns(serializer)) | set(required)
+    local = {column.split('__')[0] for column in columns}
+    deferred = [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in local
+    ]
+    relations = sorted({column.rsplit('__', 1)[0] for column in columns if '__' in column})
+
+    prefix = f'{path}__' if path else ''
+    relations = [prefix + relation for relation in relations]
+    if path:
+        relations.insert(0, path)
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.defer(*[prefix + name for name in deferred])
 
 
 class SubCategorySerializer(serializers.ModelSerializer):
@@ -20,6 +103,23 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'title']
         read_only_fields = ['id']
 
+class SubCategoryTreeSerializer(serializers.ModelSerializer):
+    product_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = SubCategory
+        fields = ['id', 'title', 'slug', 'product_count']
+
+
+class CategoryTreeSerializer(serializers.ModelSerializer):
+    items = SubCategoryTreeSerializer(many=True, read_only=True)
+    product_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ['id', 'title', 'slug', 'product_count', 'items']
+
+
 class GetSubCategorySerializer(serializers.ModelSerializer):
     category = serializers.SerializerMethodField()
 
@@ -34,15 +134,42 @@ class GetSubCategorySerializer(serializers.ModelSerializer):
             "name": obj.category.title
         }
 
-class GetProductSerializer(serializers.ModelSerializer):
+class GetProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = serializers.SerializerMethodField(required=False)
     subcategory = serializers.SerializerMethodField(required=False)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'description', 'discount', 'colour', 'size', 'price', 'undiscounted_price', 'inventory',
-                  'top_deal', 'image1', 'image2', 'image3', 'image4', 'image5', 'category', 'subcategory']
+                  'top_deal', 'image1', 'image2', 'image3', 'image4', 'image5', 'image_variants', 'category',
+                  'subcategory']
         read_only_fields = ['id']
+        sparse_columns = {
+            'category': ['category__id', 'category__title'],
+            'subcategory': ['subcategory__id', 'subcategory__title'],
+            'image_variants': IMAGE_FIELDS,
+        }
+
+    def get_image_variants(self, obj):
+        """
+        Resized WebP/JPEG URLs per image, e.g. image_variants.image1.card.webp.
+        Variants are generated in the background right after upload.
+        """
+        request = self.context.get('request')
+        variants = {}
+        for name in IMAGE_FIELDS:
+            image = getattr(obj, name)
+            if not image:
+                continue
+            urls = variant_urls(image.name)
+            if request is not None:
+                urls = {
+                    variant: {extension: request.build_absolute_uri(url) for extension, url in formats.items()}
+                    for variant, formats in urls.items()
+                }
+            variants[name] = urls
+        return variants
 
     def get_category(self, obj):
         if obj.category:
@@ -73,7 +200,7 @@ class ProductSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ProductSerializerView(serializers.ModelSerializer):
+class ProductSerializerView(SparseFieldsMixin, serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=False)
     subcategory = serializers.PrimaryKeyRelatedField(queryset=SubCategory.objects.all(), required=False)
 
@@ -84,7 +211,7 @@ class ProductSerializerView(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class SimpleProductSerializer(serializers.ModelSerializer):
+class SimpleProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer()
 
     class Meta:
@@ -95,7 +222,7 @@ class SimpleProductSerializer(serializers.ModelSerializer):
 
 class CartItemSerializer(serializers.ModelSerializer):
     sub_total = serializers.SerializerMethodField(method_name='total')
-    product = SimpleProductSerializer()
+    product = SimpleProductSerializer(sparse_prefix='product_')
 
     class Meta:
         model = CartItems
@@ -103,6 +230,8 @@ class CartItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
     def total(self, cartitem: CartItems):
+        if hasattr(cartitem, 'sub_total'):
+            return cartitem.sub_total
         return cartitem.quantity * cartitem.product.price
 
 
@@ -121,19 +250,12 @@ class CartSerializer(serializers.ModelSerializer):
         return Cart.objects.create(**validated_data)
 
     def main_total(self, cart: Cart):
-        items = cart.items.all()
-        total = sum([item.quantity * item.product.price for item in items])
-        return total
+        return cart.get_total_price()
 
 
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('there is no product associated with the given id')
-        return value
-
     def validate_quantity(self, value):
         if value < 0:
             raise serializers.ValidationError('Quantity cannot be less than 0')
@@ -146,27 +268,31 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         size = self.validated_data['size']
         user = self.context['request'].user
 
-        try:
-            product = Product.objects.get(pk=product_id)
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("The product does not exist.")
-
-        if quantity > product.inventory:
-            raise serializers.ValidationError("The requested quantity exceeds the available inventory.")
-
-        self.validated_data['owner'] = user
-
-        try:
-            cartitem = CartItems.objects.get(product_id=product_id, cart_id=cart_id, size=size)
+        with transaction.atomic():
+            # The product row lock serialises concurrent adds of the same product, so the
+            # inventory check and the increment below cannot interleave with another request.
+            product = Product.objects.select_for_update().only('id', 'name', 'inventory').filter(
+                pk=product_id
+            ).first()
+            if product is None:
+                raise serializers.ValidationError({'product_id': ['there is no product associated with the given id']})
+
+            if quantity > product.inventory:
+                raise serializers.ValidationError("The requested quantity exceeds the available inventory.")
+
+            cartitem = CartItems.objects.filter(product_id=product_id, cart_id=cart_id, size=size).first()
+            if cartitem is None:
+                self.instance = CartItems.objects.create(
+                    cart_id=cart_id, product=product, size=size, quantity=quantity, owner=user
+                )
+                return self.instance
 
             if cartitem.quantity + quantity > product.inventory:
                 raise serializers.ValidationError("The total quantity in your cart exceeds the available inventory.")
 
+            CartItems.objects.filter(pk=cartitem.pk).update(quantity=F('quantity') + quantity)
             cartitem.quantity += quantity
-            cartitem.save()
             self.instance = cartitem
-        except CartItems.DoesNotExist:
-            self.instance = CartItems.objects.create(cart_id=cart_id, **self.validated_data)
 
         return self.instance
 
@@ -176,6 +302,104 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class CartItemOperationSerializer(serializers.Serializer):
+    ADD = 'add'
+    UPDATE = 'update'
+    REMOVE = 'remove'
+
+    op = serializers.ChoiceField(choices=[ADD, UPDATE, REMOVE])
+    product_id = serializers.IntegerField()
+    size = serializers.CharField(max_length=200)
+    quantity = serializers.IntegerField(min_value=0, max_value=32767, required=False, default=0)
+
+
+class BulkCartItemSerializer(serializers.Serializer):
+    """
+    Applies a list of add/update/remove operations to one cart in a single
+    transaction: products are fetched and locked with one in_bulk query and
+    the resulting lines are written with bulk_create/bulk_update.
+    """
+    max_operations = 100
+    operations = CartItemOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, value):
+        if len(value) > self.max_operations:
+            raise serializers.ValidationError(f'At most {self.max_operations} operations per request.')
+        return value
+
+    def save(self, **kwargs):
+        cart = self.context['cart']
+        user = self.context['request'].user
+        operations = self.validated_data['operations']
+        product_ids = sorted({operation['product_id'] for operation in operations})
+
+        with transaction.atomic():
+            # locked in primary key order, like every other checkout path, to avoid deadlocks
+            products = Product.objects.select_for_update().only('id', 'name', 'inventory').order_by(
+                'pk'
+            ).in_bulk(product_ids)
+            missing = [product_id for product_id in product_ids if product_id not in products]
+            if missing:
+                raise serializers.ValidationError(
+                    {'operations': [f'there is no product associated with the id {product_id}' for product_id in missing]}
+                )
+
+            existing = {
+                (item.product_id, item.size): item
+                for item in CartItems.objects.filter(cart=cart, product_id__in=product_ids)
+            }
+            original = {key: item.quantity for key, item in existing.items()}
+            lines = dict(existing)
+
+            for operation in operations:
+                key = (operation['product_id'], operation['size'])
+                item = lines.get(key)
+                if operation['op'] == CartItemOperationSerializer.REMOVE:
+                    lines.pop(key, None)
+                    continue
+                if item is None:
+                    # a line removed earlier in the same request keeps its row
+                    item = existing.get(key)
+                    if item is not None:
+                        item.quantity = 0
+                    else:
+                        item = CartItems(cart=cart, product=products[key[0]], size=key[1], quantity=0, owner=user)
+                    lines[key] = item
+                if operation['op'] == CartItemOperationSerializer.ADD:
+                    item.quantity += operation['quantity']
+                else:
+                    item.quantity = operation['quantity']
+
+            errors = [
+                f"Not enough inventory for product '{products[product_id].name}' ({size}). "
+                f"Available: {products[product_id].inventory}, Requested: {item.quantity}"
+                for (product_id, size), item in lines.items()
+                if item.quantity > products[product_id].inventory
+            ]
+            if errors:
+                raise serializers.ValidationError({'operations': errors})
+
+            removed = [original_key for original_key in original if original_key not in lines]
+            removed += [key for key, item in lines.items() if key in original and item.quantity == 0]
+            created = [item for key, item in lines.items() if key not in original and item.quantity > 0]
+            changed = [
+                item for key, item in lines.items()
+                if key in original and item.quantity > 0 and item.quantity != original[key]
+            ]
+
+            if removed:
+                condition = Q()
+                for product_id, size in removed:
+                    condition |= Q(product_id=product_id, size=size)
+                CartItems.objects.filter(condition, cart=cart).delete()
+            if created:
+                CartItems.objects.bulk_create(created)
+            if changed:
+                CartItems.objects.bulk_update(changed, ['quantity'])
+
+        return cart
+
+
 class UpdateCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItems
@@ -195,7 +419,7 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializerView()
+    product = ProductSerializerView(sparse_prefix='product_')
 
     class Meta:
         model = OrderItem
@@ -203,13 +427,43 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class CompactOrderItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'product_name', 'size', 'quantity', 'price']
+        read_only_fields = fields
+        # columns behind the fields, for the only() in ApiOrder.get_queryset
+        columns = ['id', 'order_id', 'product_id', 'product__name', 'size', 'quantity', 'price']
+
+
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         fields = ['id', 'transaction_id', 'address', 'city', 'state', 'postal_code', 'placed_at', 'owner', 'delivered', 'delivered_on', 'total_price', 'items',]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'total_price']
+
+
+class CompactOrderSerializer(OrderSerializer):
+    items = CompactOrderItemSerializer(many=True, read_only=True)
+
+
+def order_items_prefetch(context, compact=False):
+    """
+    Prefetch of Order.items matching OrderSerializer (or, with `compact`,
+    CompactOrderSerializer): items and products in one joined query, loading
+    only the columns the selected fields read.
+    """
+    if compact:
+        items = OrderItem.objects.select_related('product').only(*CompactOrderItemSerializer.Meta.columns)
+    else:
+        item = OrderItemSerializer(context=context)
+        items = sparse_queryset(OrderItem.objects.all(), item, required=['order'])
+        items = sparse_queryset(items, item.fields['product'], path='product')
+    return Prefetch('items', queryset=items)
 
 
 class DashboardOrderSerializer(serializers.ModelSerializer):
@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from ecommerce.models import Product, Category, SubCategory, Order
+from .cache import CATALOG, SALES, bump_version, invalidate_order_summary
+from .images import IMAGE_FIELDS, product_images, schedule_variants, schedule_deletion
+from .rollups import forget_order
+from .search import FIELD_WEIGHTS, get_search_backend
+from .variants import VARIANT_FIELDS, sync_variants
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=SubCategory)
+def invalidate_catalog(sender, **kwargs):
+    bump_version(CATALOG)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(FIELD_WEIGHTS):
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def sync_product_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(VARIANT_FIELDS):
+        return
+    sync_variants([instance])
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(IMAGE_FIELDS):
+        return
+    names = product_images(instance)
+    if names:
+        transaction.on_commit(lambda: schedule_variants(names))
+
+
+@receiver(post_delete, sender=Product)
+def delete_image_variants(sender, instance, **kwargs):
+    names = product_images(instance)
+    if names:
+        transaction.on_commit(lambda: schedule_deletion(names))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_summary_cache(sender, instance, created=True, **kwargs):
+    # status updates do not change the summary; new orders get their total
+    # after post_save, so drop the entry once the transaction has committed
+    if created:
+        owner_id = instance.owner_id
+        transaction.on_commit(lambda: invalidate_order_summary(owner_id))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_sales(sender, created=True, **kwargs):
+    if created:
+        transaction.on_commit(lambda: bump_version(SALES))
+
+
+@receiver(pre_delete, sender=Order)
+def remove_from_rollups(sender, instance, **kwargs):
+    # before the cascade deletes the order's items
+    forget_order(instance)
@@ -1,3 +1,861 @@
-from django.test import TestCase
+import csv
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, make_aware, now
+from rest_framework.test import APIClient
+
+from customuser.models import User
+from ecommerce.models import (
+    Category, SubCategory, Product, Cart, CartItems, Order, PaymentEvent, DailyProductSales, OutboundEmail,
+    InventoryReservation,
+)
+from .cache import normalize_params
+from .checkout import InsufficientInventory, confirm_order, place_order, release_expired, reserve_cart
+from .gateway import FlutterwaveClient, GatewayError, GatewayUnavailable
+from .middleware import QueryBudgetExceeded
+from .outbox import queue_mail, send_pending
+from .payments import handle_event, payment_reference, process_pending
+from .search import DatabaseSearchBackend, InMemorySearchBackend
+from .views import ApiCategory, generate_confirm_token
+
+
+def seed_catalog(products=30, inventory=10):
+    categories = [Category.objects.create(title=f'Category {i}') for i in range(3)]
+    subcategories = [
+        SubCategory.objects.create(category=category, title=f'Subcategory {category.pk}-{i}')
+        for category in categories for i in range(2)
+    ]
+    return [
+        Product.objects.create(
+            name=f'Product {i}', description='Cotton', colour=['Red', 'Blue'], size=['M', 'L'],
+            price=100 + i, undiscounted_price=150 + i, inventory=inventory,
+            category=categories[i % 3], subcategory=subcategories[i % 6],
+        )
+        for i in range(products)
+    ]
+
+
+def seed_cart(owner, lines):
+    cart = Cart.objects.create(owner=owner, address='1 Road', city='Lagos', state='Lagos', postal_code='100001')
+    for product, quantity in lines:
+        CartItems.objects.create(cart=cart, owner=owner, product=product, size='M', quantity=quantity)
+    return cart
+
+
+def jwt_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.credentials(HTTP_AUTHORIZATION=f"JWT {user.tokens()['access']}")
+    return client
+
+
+def run_concurrently(count, target):
+    """
+    Call `target(i)` from `count` threads released at the same moment and
+    return the results (or raised exceptions) in thread order.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        try:
+            barrier.wait()
+            results[i] = target(i)
+        except Exception as err:
+            results[i] = err
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class FakeGatewayResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, FLW_WEBHOOK_HASH='test-hash')
+class QueryBudgetTests(TransactionTestCase):
+    """
+    Requests every action that declares a query_budget against a seeded
+    catalog, cart and order history. In strict mode QueryBudgetMiddleware
+    raises QueryBudgetExceeded, so a view going over its budget fails here.
+    Caches are cleared first so the JWT user lookup and cached responses
+    are counted on their cold path.
+    """
+
+    def setUp(self):
+        cache.clear()
+        # the background workers would race the test for the database
+        for target in ('api.outbox.schedule_delivery', 'api.payments.schedule_processing'):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.products = seed_catalog()
+        self.user = User.objects.create_user(
+            'shopper@example.com', 'secret-pass', first_name='Ada', last_name='Obi', is_verified=True
+        )
+        self.admin = User.objects.create_superuser('admin@example.com', 'secret-pass', is_verified=True)
+        for i in range(3):
+            cart = seed_cart(self.user, [(self.products[i], 1), (self.products[i + 3], 2)])
+            place_order(cart, self.user, f'seed-{i}')
+        self.order = Order.objects.filter(owner=self.user).first()
+        self.cart = seed_cart(self.user, [(self.products[10], 1), (self.products[11], 1)])
+        self.item = self.cart.items.first()
+
+    def request(self, method, url, user=None, data=None, **extra):
+        cache.clear()
+        response = getattr(jwt_client(user), method)(url, data, format='json', **extra)
+        self.assertLess(response.status_code, 400, f"{method.upper()} {url}: {response.status_code}")
+        return response
+
+    def test_catalog(self):
+        product = self.products[0]
+        category = product.category
+        subcategory = product.subcategory
+        for user in (None, self.user):
+            self.request('get', '/api/products/', user)
+            self.request('get', '/api/products/?search=product&colour=Red', user)
+            self.request('get', f'/api/products/{product.pk}/', user)
+            self.request('get', '/api/products/facets/', user)
+            self.request('get', '/api/categories/', user)
+            self.request('get', f'/api/categories/{category.pk}/', user)
+            self.request('get', '/api/categories/tree/', user)
+            self.request('get', '/api/subcategory/', user)
+            self.request('get', f'/api/subcategory/{subcategory.pk}/', user)
+
+        created = self.request('post', '/api/products/', self.admin, {
+            'name': 'Linen Shirt', 'description': 'Linen', 'colour': ['White'], 'size': ['M'],
+            'price': '120.00', 'inventory': 4, 'category': category.pk, 'subcategory': subcategory.pk,
+        })
+        self.request('patch', f"/api/products/{created.data['id']}/", self.admin, {'price': '110.00'})
+        self.request('delete', f"/api/products/{created.data['id']}/", self.admin)
+
+    def test_cart(self):
+        cart_url = f'/api/carts/{self.cart.pk}/'
+        self.request('get', '/api/carts/', self.user)
+        self.request('get', cart_url, self.user)
+        self.request('post', '/api/carts/', self.user, {
+            'address': '2 Road', 'city': 'Abuja', 'state': 'FCT', 'postal_code': '900001'
+        })
+
+        self.request('get', f'{cart_url}items/', self.user)
+        self.request('get', f'{cart_url}items/{self.item.pk}/', self.user)
+        self.request('post', f'{cart_url}items/', self.user,
+                     {'product_id': self.products[12].pk, 'size': 'M', 'quantity': 1})
+        self.request('post', f'{cart_url}items/', self.user,
+                     {'product_id': self.products[12].pk, 'size': 'M', 'quantity': 1})
+        self.request('patch', f'{cart_url}items/{self.item.pk}/', self.user, {'quantity': 2})
+        self.request('post', f'{cart_url}items/bulk/', self.user, {'operations': [
+            {'op': 'add', 'product_id': self.products[13].pk, 'size': 'M', 'quantity': 1},
+            {'op': 'update', 'product_id': self.products[12].pk, 'size': 'M', 'quantity': 3},
+            {'op': 'remove', 'product_id': self.products[11].pk, 'size': 'M'},
+        ]})
+        self.request('delete', f'{cart_url}items/{self.item.pk}/', self.user)
+
+    def test_checkout(self):
+        gateway = mock.Mock()
+        gateway.create_payment.return_value = FakeGatewayResponse(
+            200, {'status': 'success', 'data': {'link': 'https://checkout.example.com/pay'}}
+        )
+        with mock.patch('api.views.get_gateway', return_value=gateway):
+            self.request('post', f'/api/carts/{self.cart.pk}/pay/', self.user)
+
+        token = generate_confirm_token(self.user, str(self.cart.pk))
+        url = f'/api/carts/confirm_payment/?c_id={self.cart.pk}&token={token}&status=successful&transaction_id=tx-1'
+        self.request('get', url)
+        # the redirect comes back once more after the order is placed
+        self.request('get', url)
+
+        self.request('post', '/api/payments/webhook/', data={
+            'event': 'charge.completed', 'data': {'id': 'tx-2', 'tx_ref': '1-ref', 'status': 'successful'},
+        }, HTTP_VERIF_HASH='test-hash')
+
+    def test_orders(self):
+        for user in (self.user, self.admin):
+            self.request('get', '/api/orders/', user)
+            self.request('get', '/api/orders/?items=compact', user)
+        self.request('get', f'/api/orders/{self.order.pk}/', self.user)
+        self.request('get', f'/api/orders/{self.order.pk}/?items=compact', self.user)
+        self.request('patch', f'/api/orders/{self.order.pk}/', self.admin, {'delivered': True})
+        self.request('delete', f'/api/orders/{self.order.pk}/', self.admin)
+
+        self.request('get', '/auth/profile/', self.user)
+        self.request('get', '/auth/profile/orders/', self.user)
+
+    def test_dashboard(self):
+        today = localdate()
+        since = (today - timedelta(days=30)).isoformat()
+        for query in ('', f'?start_date={since}&end_date={today.isoformat()}', f'?year={today.year}'):
+            self.request('get', f'/api/dashboard/{query}', self.admin)
+            self.request('get', f'/api/dashboard/timeseries/{query}', self.admin)
+            self.request('get', f'/api/dashboard/most-sold-products/{query}', self.admin)
+            response = self.request('get', f'/api/dashboard/export/{query}', self.admin)
+            b''.join(response.streaming_content)
+        self.request('get', '/api/dashboard/?id=1', self.admin)
+        self.request('get', '/api/dashboard/summary/', self.admin)
+
+    def test_over_budget_raises(self):
+        with mock.patch.dict(ApiCategory.query_budget, {'list': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                jwt_client().get('/api/categories/')
+
+
+class NormalizeParamsTests(SimpleTestCase):
+    def test_key_order_and_empty_keys_are_ignored(self):
+        self.assertEqual(normalize_params(QueryDict('b=2&a=1')), normalize_params(QueryDict('a=1&b=2&c=')))
+
+    def test_repeated_values_keep_their_order(self):
+        # CharFilter reads the last value, so these are different requests
+        self.assertNotEqual(
+            normalize_params(QueryDict('colour=red&colour=blue')),
+            normalize_params(QueryDict('colour=blue&colour=red')),
+        )
+        self.assertNotEqual(normalize_params(QueryDict('colour=red&colour=')), normalize_params(QueryDict('colour=red')))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class AddToCartConcurrencyTests(TransactionTestCase):
+    """
+    Parallel adds to one cart must end up as a single line holding every
+    accepted unit, never more than the product's stock.
+    """
+
+    def setUp(self):
+        self.product = seed_catalog(products=1, inventory=5)[0]
+        self.user = User.objects.create_user('shopper@example.com', 'secret-pass', is_verified=True)
+        self.cart = seed_cart(self.user, [])
+
+    def add(self, quantity):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post(f'/api/carts/{self.cart.pk}/items/',
+                           {'product_id': self.product.pk, 'size': 'M', 'quantity': quantity}, format='json')
+
+    def test_parallel_adds_accumulate(self):
+        responses = run_concurrently(4, lambda i: self.add(1))
+
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        item = CartItems.objects.get(cart=self.cart, product=self.product, size='M')
+        self.assertEqual(item.quantity, 4)
+
+    def test_parallel_adds_stop_at_inventory(self):
+        responses = run_concurrently(8, lambda i: self.add(1))
+
+        statuses = [response.status_code for response in responses]
+        self.assertEqual(statuses.count(201), 5)
+        self.assertEqual(statuses.count(400), 3)
+        item = CartItems.objects.get(cart=self.cart, product=self.product, size='M')
+        self.assertEqual(item.quantity, 5)
+
+
+class BulkCartItemTests(TransactionTestCase):
+    def setUp(self):
+        self.products = seed_catalog(products=3)
+        self.user = User.objects.create_user('shopper@example.com', 'secret-pass', is_verified=True)
+        self.cart = seed_cart(self.user, [(self.products[0], 2), (self.products[1], 1)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, *operations):
+        return self.client.post(f'/api/carts/{self.cart.pk}/items/bulk/', {'operations': operations}, format='json')
+
+    def quantities(self):
+        return dict(CartItems.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+
+    def test_operations_apply_in_order(self):
+        first, second, third = self.products
+        response = self.bulk(
+            {'op': 'add', 'product_id': first.pk, 'size': 'M', 'quantity': 1},
+            {'op': 'update', 'product_id': second.pk, 'size': 'M', 'quantity': 0},
+            {'op': 'add', 'product_id': third.pk, 'size': 'M', 'quantity': 4},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {first.pk: 3, third.pk: 4})
+
+    def test_remove_then_add_reuses_the_line(self):
+        line = CartItems.objects.get(cart=self.cart, product=self.products[0])
+        response = self.bulk(
+            {'op': 'remove', 'product_id': self.products[0].pk, 'size': 'M'},
+            {'op': 'add', 'product_id': self.products[0].pk, 'size': 'M', 'quantity': 5},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {self.products[0].pk: 5, self.products[1].pk: 1})
+        self.assertTrue(CartItems.objects.filter(pk=line.pk, quantity=5).exists())
+
+    def test_shortfall_changes_nothing(self):
+        response = self.bulk(
+            {'op': 'remove', 'product_id': self.products[1].pk, 'size': 'M'},
+            {'op': 'add', 'product_id': self.products[0].pk, 'size': 'M', 'quantity': 50},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantities(), {self.products[0].pk: 2, self.products[1].pk: 1})
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CheckoutRaceTests(TransactionTestCase):
+    """
+    Checkouts racing for a small stock: the orders that go through never
+    add up to more than the inventory, and the rest fail as a whole.
+    """
+
+    def setUp(self):
+        patcher = mock.patch('api.outbox.schedule_delivery')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.product, self.other = seed_catalog(products=2, inventory=5)
+        self.carts = []
+        for i in range(6):
+            user = User.objects.create_user(f'shopper{i}@example.com', 'secret-pass', is_verified=True)
+            self.carts.append(seed_cart(user, [(self.other, 1), (self.product, 2)]))
+
+    def checkout(self, i):
+        cart = self.carts[i]
+        return confirm_order(cart.pk, cart.owner, f'race-{i}')
+
+    def test_concurrent_checkouts_do_not_oversell(self):
+        results = run_concurrently(len(self.carts), self.checkout)
+
+        placed = [result for result in results if isinstance(result, Order)]
+        failed = [result for result in results if isinstance(result, InsufficientInventory)]
+        self.assertEqual((len(placed), len(failed)), (2, 4), results)
+
+        self.product.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.product.inventory, 1)
+        # the failed orders rolled back their other lines too
+        self.assertEqual(self.other.inventory, 3)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(Cart.objects.count(), 4)
+
+
+class InventoryReservationTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch('api.outbox.schedule_delivery')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.product, self.other = seed_catalog(products=2, inventory=3)
+        self.shopper = User.objects.create_user('shopper@example.com', 'secret-pass', is_verified=True)
+        self.rival = User.objects.create_user('rival@example.com', 'secret-pass', is_verified=True)
+        self.cart = seed_cart(self.shopper, [(self.product, 2)])
+        self.rival_cart = seed_cart(self.rival, [(self.product, 2)])
+
+    def hold(self, cart, product, quantity, expires_in):
+        return InventoryReservation.objects.create(
+            cart=cart, product=product, size='M', quantity=quantity,
+            expires_at=now() + timedelta(seconds=expires_in),
+        )
+
+    def test_pay_is_refused_while_another_cart_holds_the_stock(self):
+        gateway = mock.Mock()
+        gateway.create_payment.return_value = FakeGatewayResponse(
+            200, {'status': 'success', 'data': {'link': 'https://checkout.example.com/pay'}}
+        )
+        with mock.patch('api.views.get_gateway', return_value=gateway):
+            response = jwt_client(self.shopper).post(f'/api/carts/{self.cart.pk}/pay/')
+            self.assertEqual(response.status_code, 200)
+            response = jwt_client(self.rival).post(f'/api/carts/{self.rival_cart.pk}/pay/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Available: 1, Requested: 2', response.data['error'])
+        self.assertEqual(gateway.create_payment.call_count, 1)
+        self.assertEqual(list(self.cart.reservations.values_list('product', 'quantity')), [(self.product.pk, 2)])
+        self.assertFalse(self.rival_cart.reservations.exists())
+
+    def test_expired_holds_stop_counting_and_are_released_in_batches(self):
+        for _ in range(5):
+            self.hold(self.cart, self.product, 3, expires_in=-60)
+        active = self.hold(self.cart, self.other, 1, expires_in=60)
+
+        # the expired rows still exist but no longer hold back the stock
+        self.assertEqual(len(reserve_cart(self.rival_cart)), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(release_expired(batch_size=2), 5)
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(
+            set(InventoryReservation.objects.values_list('pk', flat=True)),
+            {active.pk, *self.rival_cart.reservations.values_list('pk', flat=True)},
+        )
+
+    def test_confirm_order_ignores_the_carts_own_holds_and_removes_them(self):
+        CartItems.objects.filter(cart=self.rival_cart).update(quantity=1)
+        reserve_cart(self.cart)
+        reserve_cart(self.rival_cart)
+
+        order = confirm_order(self.cart.pk, self.shopper, 'tx-held')
+
+        self.assertEqual(order.items.get().quantity, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory, 1)
+        self.assertFalse(InventoryReservation.objects.filter(cart_id=self.cart.pk).exists())
+        # the other cart keeps its hold on the last unit
+        self.assertEqual(list(self.rival_cart.reservations.values_list('quantity', flat=True)), [1])
+        late_cart = seed_cart(self.shopper, [(self.product, 1)])
+        with self.assertRaises(InsufficientInventory):
+            confirm_order(late_cart.pk, self.shopper, 'tx-late')
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """
+    Answers like Flutterwave with the status (and after the delay) set on
+    the server, and records the requests and client connections it saw.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self):
+        server = self.server
+        server.requests.append((self.command, self.path))
+        server.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(server.delay)
+        body = json.dumps({'status': 'success', 'data': {'link': 'https://checkout.example.com/pay'}}).encode()
+        try:
+            self.send_response(server.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client timed out and hung up, as the timeout tests intend
+            pass
+
+    do_GET = do_POST = reply
+
+
+class GatewayClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGatewayHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.status, self.server.delay = 200, 0
+        self.server.requests, self.server.connections = [], set()
+        self.client = self.make_client(f'http://127.0.0.1:{self.server.server_port}/v3')
+
+    def make_client(self, base_url):
+        return FlutterwaveClient(base_url, 'test-key', read_timeout=0.3, max_retries=2, backoff=0.01,
+                                 failure_threshold=3, reset_timeout=0.2)
+
+    def test_calls_share_a_keep_alive_connection(self):
+        for _ in range(3):
+            self.assertEqual(self.client.create_payment({'amount': '100'}).status_code, 200)
+
+        self.assertEqual(self.server.requests, [('POST', '/v3/payments')] * 3)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.client.metrics.snapshot()['POST /payments']['calls'], 3)
+
+    def test_idempotent_call_is_retried_on_server_errors(self):
+        self.server.status = 503
+        response = self.client.verify_transaction(42)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests, [('GET', '/v3/transactions/42/verify')] * 3)
+
+    def test_payment_is_not_retried_after_a_read_timeout(self):
+        self.server.delay = 0.5
+        with self.assertRaises(GatewayError):
+            self.client.create_payment({'amount': '100'})
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_payment_is_retried_when_the_connection_is_refused(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        client = self.make_client(f'http://127.0.0.1:{port}/v3')
+
+        with mock.patch.object(client, '_sleep') as sleep, self.assertRaises(GatewayError):
+            client.create_payment({'amount': '100'})
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.server.status = 500
+        for _ in range(3):
+            self.assertEqual(self.client.create_payment({'amount': '100'}).status_code, 500)
+
+        with self.assertRaises(GatewayUnavailable):
+            self.client.create_payment({'amount': '100'})
+        self.assertEqual(len(self.server.requests), 3)
+
+        # a trial call is let through after reset_timeout and closes the circuit again
+        time.sleep(0.25)
+        self.server.status = 200
+        self.assertEqual(self.client.create_payment({'amount': '100'}).status_code, 200)
+        self.assertEqual(self.client.breaker.state, self.client.breaker.CLOSED)
+
+
+class CacheStatsTests(TestCase):
+    def test_reports_gateway_latencies_to_admins(self):
+        gateway = FlutterwaveClient('http://127.0.0.1:9/v3', 'test-key')
+        gateway.metrics.record('POST /payments', 0.2, 'ok')
+        gateway.metrics.record('POST /payments', 0.4, 'timeout')
+        admin = User.objects.create_superuser('admin@example.com', 'secret-pass', is_verified=True)
+        shopper = User.objects.create_user('shopper@example.com', 'secret-pass', is_verified=True)
+
+        with mock.patch('api.views.get_gateway', return_value=gateway):
+            self.assertEqual(jwt_client(shopper).get('/api/cache-stats/').status_code, 403)
+            response = jwt_client(admin).get('/api/cache-stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['gateway'], {
+            'POST /payments': {'calls': 2, 'failures': 1, 'avg_ms': 300.0, 'max_ms': 400.0},
+        })
+
+class PaymentEventProcessingTests(TransactionTestCase):
+    def setUp(self):
+        self.events = [
+            PaymentEvent.objects.create(event_type='charge.completed', transaction_id=f'tx-{i}', payload={
+                'event': 'charge.completed', 'data': {'id': f'tx-{i}', 'status': 'failed'},
+            })
+            for i in range(2)
+        ]
+
+    def test_failing_event_is_retried_without_blocking_the_rest(self):
+        first, second = self.events
+
+        def fail_first(event):
+            if event.pk == first.pk:
+                raise IntegrityError('deadlock')
+            return handle_event(event)
+
+        with mock.patch('api.payments.handle_event', side_effect=fail_first):
+            self.assertEqual(process_pending(), 2)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.error), (PaymentEvent.PENDING, 1, 'deadlock'))
+        self.assertGreater(first.next_attempt_at, now())
+        self.assertEqual(second.status, PaymentEvent.IGNORED)
+
+        # backed off events are not picked up again straight away
+        with mock.patch('api.payments.handle_event') as handle:
+            self.assertEqual(process_pending(), 0)
+        handle.assert_not_called()
+
+    @override_settings(PAYMENT_EVENT_MAX_ATTEMPTS=3)
+    def test_event_fails_after_max_attempts(self):
+        with mock.patch('api.payments.handle_event', side_effect=IntegrityError('deadlock')):
+            for _ in range(3):
+                PaymentEvent.objects.update(next_attempt_at=now())
+                process_pending()
+
+        self.assertEqual(
+            list(PaymentEvent.objects.values_list('status', 'attempts')), [(PaymentEvent.FAILED, 3)] * 2
+        )
+
+    def test_charge_is_verified_outside_the_order_transaction(self):
+        PaymentEvent.objects.all().delete()
+        product, = seed_catalog(products=1)
+        user = User.objects.create_user('shopper@example.com', 'secret-pass', is_verified=True)
+        cart = seed_cart(user, [(product, 2)])
+        tx_ref = payment_reference(cart.pk)
+        event = PaymentEvent.objects.create(event_type='charge.completed', transaction_id='tx-paid', payload={
+            'event': 'charge.completed', 'data': {'id': 'tx-paid', 'tx_ref': tx_ref, 'status': 'successful'},
+        })
+        in_transaction = {}
+
+        def verify(transaction_id):
+            in_transaction['verify'] = connection.in_atomic_block
+            return FakeGatewayResponse(200, {'data': {'status': 'successful', 'tx_ref': tx_ref, 'amount': 200}})
+
+        def place(*args):
+            in_transaction['confirm'] = connection.in_atomic_block
+            return confirm_order(*args)
+
+        gateway = mock.Mock()
+        gateway.verify_transaction.side_effect = verify
+        with mock.patch('api.payments.get_gateway', return_value=gateway), \
+                mock.patch('api.payments.confirm_order', side_effect=place), \
+                mock.patch('api.outbox.schedule_delivery'):
+            self.assertEqual(process_pending(), 1)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, PaymentEvent.PROCESSED)
+        self.assertEqual(in_transaction, {'verify': False, 'confirm': True})
+        self.assertTrue(Order.objects.filter(transaction_id='tx-paid', owner=user).exists())
+
+
+class OrderExportTests(TransactionTestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin@example.com', 'secret-pass', is_verified=True)
+        placed_at = now()
+        self.orders = [Order.objects.create(owner=self.admin, transaction_id=f'tx-{i}') for i in range(7)]
+        # ties on placed_at are broken by id
+        Order.objects.filter(pk__in=[order.pk for order in self.orders[2:5]]).update(placed_at=placed_at)
+
+    def test_export_pages_through_every_order(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch('api.exports.EXPORT_CHUNK_SIZE', 2):
+            response = client.get('/api/dashboard/export/')
+            rows = list(csv.reader(line.decode() for line in response.streaming_content))
+
+        self.assertEqual(rows[0][:2], ['id', 'placed_at'])
+        expected = Order.objects.order_by('-placed_at', '-id').values_list('id', flat=True)
+        self.assertEqual([int(row[0]) for row in rows[1:]], list(expected))
+
+
+class SalesRollupTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch('api.outbox.schedule_delivery')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.products = seed_catalog(products=2)
+        self.user = User.objects.create_user('shopper@example.com', 'secret-pass', is_verified=True)
+        self.admin = User.objects.create_superuser('admin@example.com', 'secret-pass', is_verified=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.orders = [
+            place_order(seed_cart(self.user, [(self.products[0], 1), (self.products[1], i + 1)]), self.user, f'tx-{i}')
+            for i in range(2)
+        ]
+
+    def summary(self):
+        cache.clear()
+        return self.client.get('/api/dashboard/summary/').data
+
+    def test_deleting_an_order_removes_it_from_the_rollups(self):
+        kept, deleted = self.orders
+        self.assertEqual(self.summary()['total_orders'], 2)
+
+        response = self.client.delete(f'/api/orders/{deleted.pk}/')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.summary(), {'total_orders': 1, 'total_revenue': kept.total_price})
+        self.assertEqual(
+            dict(DailyProductSales.objects.values_list('product_id', 'quantity')),
+            {self.products[0].pk: 1, self.products[1].pk: 1},
+        )
+
+
+class OrderTimeseriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'secret-pass', is_verified=True)
+        # Mon 4th twice, Wed 6th, Sun 10th and Mon 11th of March 2024
+        for day, total in ((4, 100), (4, 50), (6, 20), (10, 5), (11, 1)):
+            order = Order.objects.create(owner=cls.admin, address='1 Road', city='Lagos', state='Lagos',
+                                         transaction_id=f'tx-{day}-{total}')
+            Order.objects.filter(pk=order.pk).update(
+                placed_at=make_aware(datetime(2024, 3, day, 12)), total_price=total,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def series(self, query):
+        response = self.client.get(f'/api/dashboard/timeseries/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row['period'], row['order_count'], float(row['revenue'])) for row in response.json()['results']]
+
+    def test_days_without_orders_are_zero_filled(self):
+        self.assertEqual(self.series('granularity=day&start_date=2024-03-03&end_date=2024-03-07'), [
+            ('2024-03-03', 0, 0), ('2024-03-04', 2, 150), ('2024-03-05', 0, 0),
+            ('2024-03-06', 1, 20), ('2024-03-07', 0, 0),
+        ])
+
+    def test_weeks_start_on_monday(self):
+        self.assertEqual(self.series('granularity=week&year=2024&month=3'), [
+            ('2024-02-26', 0, 0), ('2024-03-04', 4, 175), ('2024-03-11', 1, 1),
+            ('2024-03-18', 0, 0), ('2024-03-25', 0, 0),
+        ])
+
+    def test_months_cover_the_selected_year(self):
+        series = self.series('granularity=month&year=2024')
+        self.assertEqual(len(series), 12)
+        self.assertEqual(series[2], ('2024-03-01', 5, 176))
+
+    def test_too_many_buckets_is_rejected(self):
+        query = 'start_date=2020-01-01&end_date=2024-12-31'
+        response = self.client.get(f'/api/dashboard/timeseries/?granularity=day&{query}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit is 1000', response.data['granularity'])
+        self.assertEqual(len(self.series(f'granularity=week&{query}')), 262)
+
+    def test_invalid_dates_are_rejected(self):
+        for query in ('year=2024&month=13', 'year=2024&month=0', 'year=-5', 'year=10000', 'month=1.5'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/dashboard/timeseries/?{query}').status_code, 400)
+                self.assertEqual(self.client.get(f'/api/dashboard/?{query}').status_code, 400)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class EmailOutboxTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch('api.outbox.schedule_delivery')
+        self.schedule = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queued_mail_is_sent_after_commit(self):
+        queue_mail('Verify your email', 'Your OTP is: 123456', 'shop@example.com', ['ada@example.com'])
+        self.schedule.assert_called_once()
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(send_pending(), 1)
+        self.assertEqual(mail.outbox[0].to, ['ada@example.com'])
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.SENT)
+
+    def test_failing_mail_is_retried_then_dead_lettered(self):
+        queue_mail('Verify your email', 'Your OTP is: 123456', 'shop@example.com', ['ada@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            send_pending()
+            email = OutboundEmail.objects.get()
+            self.assertEqual((email.status, email.attempts, email.error), (OutboundEmail.PENDING, 1, 'down'))
+            self.assertGreater(email.next_attempt_at, now())
+
+            OutboundEmail.objects.update(next_attempt_at=now())
+            send_pending()
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.DEAD)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Walking the cursor links forwards and back must give exactly the rows
+    of the page-number listing, in the same order, whatever the ordering.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(title='Shirts')
+        for i in range(13):
+            Product.objects.create(
+                name=f"{'Red Linen' if i % 3 == 0 else 'Blue Cotton'} Shirt {i}", colour=['Red'], size=['M'],
+                # prices tie in threes and every fourth product has no undiscounted price
+                price=100 + i // 3 * 10, undiscounted_price=None if i % 4 == 0 else 200 - i // 2 * 10,
+                top_deal=i % 5 == 0, category=category,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, url):
+        return [row['id'] for row in self.client.get(url).data['results']]
+
+    def walk(self, query):
+        url = f'/api/products/?pagination=cursor&page_size=4&{query}'
+        forward, pages = [], []
+        while url:
+            data = self.client.get(url).data
+            pages.append([row['id'] for row in data['results']])
+            forward += pages[-1]
+            last_previous, url = data['previous'], data['next']
+
+        backward = pages[-1]
+        url = last_previous
+        while url:
+            data = self.client.get(url).data
+            backward = [row['id'] for row in data['results']] + backward
+            url = data['previous']
+        return forward, backward
+
+    def test_cursor_pages_match_page_number_order(self):
+        for query in ('', 'ordering=price', 'ordering=-price', 'ordering=undiscounted_price',
+                      'ordering=-undiscounted_price', 'search=red shirt', 'search=shirt&colour=Red'):
+            with self.subTest(query=query):
+                expected = self.ids(f'/api/products/?page_size=100&{query}')
+                forward, backward = self.walk(query)
+                self.assertEqual(len(expected), len(set(expected)))
+                self.assertEqual(forward, expected)
+                self.assertEqual(backward, expected)
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('not-base64!', 'eyJ2IjpbMV19', 'eyJ2IjpbImEiLCJiIl19'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f'/api/products/?cursor={cursor}').status_code, 404)
+
+
+class SearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.name = Product.objects.create(name='Cotton Shirt', description='Plain', colour=['White'])
+        cls.colour = Product.objects.create(name='Dress', description='Plain', colour={'Main': 'Cotton'})
+        cls.material = Product.objects.create(name='Skirt', material='Cotton', colour=['Black'])
+        cls.description = Product.objects.create(name='Scarf', description='Soft cotton blend')
+        cls.other = Product.objects.create(name='Leather Belt', description='Brown', colour=['Brown'])
+
+    def backends(self):
+        # a fresh in-memory backend, so its index has to be built from the database
+        return [DatabaseSearchBackend(), InMemorySearchBackend()]
+
+    def ranked(self, backend, query):
+        results = backend.search(Product.objects.all(), query).order_by('-relevance', 'id')
+        return [(product.pk, product.relevance) for product in results]
+
+    def test_matches_are_ranked_by_field_weight(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(self.ranked(backend, 'cotton'), [
+                    (self.name.pk, 5), (self.colour.pk, 3), (self.material.pk, 2), (self.description.pk, 1),
+                ])
+                # scores of each query term add up
+                self.assertEqual(self.ranked(backend, 'cotton shirt')[0], (self.name.pk, 10))
+
+    def test_terms_match_as_prefixes(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(
+                    [pk for pk, _ in self.ranked(backend, 'cot')],
+                    [self.name.pk, self.colour.pk, self.material.pk, self.description.pk],
+                )
+                self.assertEqual(self.ranked(backend, 'leath'), [(self.other.pk, 5)])
+                self.assertEqual(self.ranked(backend, 'cottons'), [])
+                self.assertEqual(self.ranked(backend, 'x'), [])
+
+    def test_in_memory_index_follows_saves_after_loading(self):
+        backend = InMemorySearchBackend()
+        self.assertEqual(self.ranked(backend, 'belt'), [(self.other.pk, 5)])
+        self.other.name = 'Leather Strap'
+        backend.index(self.other)
+        backend.remove(self.description.pk)
+        self.assertEqual(self.ranked(backend, 'belt'), [])
+        self.assertEqual(self.ranked(backend, 'strap'), [(self.other.pk, 5)])
+        self.assertNotIn(self.description.pk, [pk for pk, _ in self.ranked(backend, 'cotton')])
+
+    def test_search_without_matches_returns_an_empty_page(self):
+        cache.clear()
+        for query in ('x', 'zzzz'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/products/?search={query}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['results'], [])
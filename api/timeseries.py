@@ -0,0 +1,102 @@
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Count, Sum, DateField
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+
+TRUNCATE = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+# longest series served; a longer range has to use a coarser granularity
+MAX_BUCKETS = 1000
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def check_length(start, end, granularity):
+    start = bucket_start(start, granularity)
+    if granularity == 'week':
+        buckets = (end - start).days // 7 + 1
+    elif granularity == 'month':
+        buckets = (end.year - start.year) * 12 + end.month - start.month + 1
+    else:
+        buckets = (end - start).days + 1
+    if buckets > MAX_BUCKETS:
+        raise ValueError(f"The range spans {buckets} {granularity}s, the limit is {MAX_BUCKETS}. "
+                         f"Narrow it or use a coarser granularity.")
+
+
+def filter_bounds(cleaned_data):
+    """
+    First and last day covered by OrderFilter's start_date/end_date, or
+    by year and month, so the series spans the whole selected range even
+    where it has no orders. Either end may be None.
+    """
+    start, end = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+    year, month = cleaned_data.get('year'), cleaned_data.get('month')
+    if year:
+        year = int(year)
+        if month:
+            month = int(month)
+            start = max(start or date.min, date(year, month, 1))
+            end = min(end or date.max, date(year, month, calendar.monthrange(year, month)[1]))
+        else:
+            start = max(start or date.min, date(year, 1, 1))
+            end = min(end or date.max, date(year, 12, 31))
+    return start, end
+
+
+def order_timeseries(orders, granularity, start=None, end=None):
+    """
+    Order count and revenue of `orders` per day, week (starting Monday) or
+    month, grouped by the database. Buckets without orders between `start`
+    and `end` (or the first and last order when not given) are filled with
+    zeros. Raises ValueError when the series would exceed MAX_BUCKETS.
+    """
+    if start is not None and end is not None:
+        check_length(start, end, granularity)
+
+    truncate = TRUNCATE[granularity]
+    rows = (
+        orders.order_by()
+        .annotate(period=truncate('placed_at', output_field=DateField()))
+        .values('period')
+        .annotate(order_count=Count('id'), revenue=Sum('total_price'))
+        .order_by('period')
+    )
+    found = {row['period']: row for row in rows}
+
+    if start is None or end is None:
+        if not found:
+            return []
+        start = start or min(found)
+        end = end or max(found)
+        check_length(start, end, granularity)
+
+    series = []
+    period = bucket_start(start, granularity)
+    while period <= end:
+        row = found.get(period)
+        series.append({
+            'period': period,
+            'order_count': row['order_count'] if row else 0,
+            'revenue': (row['revenue'] or 0) if row else 0,
+        })
+        period = next_bucket(period, granularity)
+    return series
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested.routers import NestedDefaultRouter
-from .views import ApiProducts, ApiCart, ApiCartItem, ApiCategory, ApiOrder, ApiSubCategory, DashboardOrderViewSet
+from .views import ApiProducts, ApiCart, ApiCartItem, ApiCategory, ApiOrder, ApiSubCategory, DashboardOrderViewSet, \
+    CacheStatsViewSet, PaymentWebhookViewSet
 
 router = DefaultRouter()
 
@@ -19,8 +20,12 @@ urlpatterns = [
     path('', include(router.urls)),
     path('', include(cart_router.urls)),
     path('dashboard/', DashboardOrderViewSet.as_view({'get': 'list'}), name='dashboard'),
+    path('dashboard/export/', DashboardOrderViewSet.as_view({'get': 'export'}), name='dashboard_export'),
+    path('dashboard/timeseries/', DashboardOrderViewSet.as_view({'get': 'timeseries'}), name='dashboard_timeseries'),
     path('dashboard/summary/', DashboardOrderViewSet.as_view({'get': 'summary'}),
          name='summary'),
     path('dashboard/most-sold-products/', DashboardOrderViewSet.as_view({'get': 'most_sold_products'}),
          name='most_sold_products'),
+    path('cache-stats/', CacheStatsViewSet.as_view({'get': 'list'}), name='cache_stats'),
+    path('payments/webhook/', PaymentWebhookViewSet.as_view({'post': 'create'}), name='payment_webhook'),
 ]
@@ -0,0 +1,77 @@
+import re
+
+from django.db import transaction
+from django.db.models import Count, Min
+
+from ecommerce.models import ProductVariantValue
+
+VARIANT_FIELDS = (ProductVariantValue.COLOUR, ProductVariantValue.SIZE)
+MAX_VALUE_LENGTH = 100
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(value):
+    return WHITESPACE.sub(' ', str(value)).strip().casefold()[:MAX_VALUE_LENGTH]
+
+
+def split_values(raw):
+    """
+    Labels held in a colour/size JSONField: a comma separated string, a list
+    of strings, or a dict keyed by label.
+    """
+    if raw is None:
+        return []
+    if isinstance(raw, dict):
+        raw = list(raw.keys())
+    if isinstance(raw, (list, tuple)):
+        return [label for item in raw for label in split_values(item)]
+    return [label.strip() for label in str(raw).split(',') if label.strip()]
+
+
+def variant_values(product):
+    values = {}
+    for kind in VARIANT_FIELDS:
+        for label in split_values(getattr(product, kind)):
+            value = normalize(label)
+            if value:
+                values.setdefault((kind, value), label[:MAX_VALUE_LENGTH])
+    return values
+
+
+def sync_variants(products):
+    """
+    Bring the ProductVariantValue rows of `products` in line with their
+    colour/size JSON, touching only the rows that changed.
+    """
+    wanted = {product.pk: variant_values(product) for product in products}
+    existing = {}
+    for row in ProductVariantValue.objects.filter(product_id__in=list(wanted)):
+        existing[(row.product_id, row.kind, row.value)] = row
+
+    stale = [row.pk for key, row in existing.items() if key[1:] not in wanted[key[0]]]
+    new = [
+        ProductVariantValue(product_id=product_id, kind=kind, value=value, label=label)
+        for product_id, values in wanted.items()
+        for (kind, value), label in values.items()
+        if (product_id, kind, value) not in existing
+    ]
+    with transaction.atomic():
+        if stale:
+            ProductVariantValue.objects.filter(pk__in=stale).delete()
+        if new:
+            ProductVariantValue.objects.bulk_create(new, batch_size=1000)
+
+
+def variant_facets(kind, products):
+    """
+    Per-value product counts of one variant kind over the `products`
+    queryset, computed in a single grouped query.
+    """
+    rows = (
+        ProductVariantValue.objects
+        .filter(kind=kind, product__in=products.order_by().values('pk'))
+        .values('value')
+        .annotate(label=Min('label'), count=Count('product'))
+        .order_by('-count', 'value')
+    )
+    return list(rows)
@@ -1,31 +1,36 @@
-import uuid
 from django.http import JsonResponse
 import requests
-from django.db.models import Sum, F, Value, DecimalField
-from django.db.models.functions import Coalesce, Cast
+from django.db.models import Sum, F, Value, DecimalField, Prefetch, Count, Q
+from django.db.models.functions import Coalesce
 from rest_framework.viewsets import ViewSet
-from .utils import EmailThread
+from .checkout import confirm_order, reserve_cart, release_cart, EmptyCart, InsufficientInventory
+from .cache import CachedResponseMixin, CATALOG, SALES, get_stats
+from .gateway import get_gateway, GatewayError, GatewayUnavailable
+from .payments import payment_reference, verify_signature, record_event
+from .pagination import KeysetPagination, DashboardOrderPagination
+from .exports import EXPORT_FORMATS, streaming_export
+from .timeseries import TRUNCATE, filter_bounds, order_timeseries
+from .variants import VARIANT_FIELDS, variant_facets
 from rest_framework.response import Response
 from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
-from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from .permissions import IsAdminOrReadOnly, IsOwner, IsOwnerOrAdmin
-from ecommerce.models import Product, Category, Cart, Order, CartItems, OrderItem, SubCategory
-from .filters import ProductFilter, OrderFilter
+from ecommerce.models import Product, Category, Cart, Order, CartItems, SubCategory, DailySales, DailyProductSales
+from .filters import ProductFilter, OrderFilter, ProductSearchFilter, DailySalesFilter
 from .serializers import ProductSerializer, CategorySerializer, CartSerializer, CartItemSerializer, \
     AddCartItemSerializer, UpdateCartItemSerializer, OrderSerializer, SimpleProductSerializer, \
-    SubCategorySerializer, GetSubCategorySerializer, GetProductSerializer, DashboardOrderSerializer
+    SubCategorySerializer, GetSubCategorySerializer, GetProductSerializer, DashboardOrderSerializer, \
+    CategoryTreeSerializer, BulkCartItemSerializer, CompactOrderSerializer, order_items_prefetch, sparse_queryset
 from datetime import timedelta
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils.timezone import now
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 
 
 def generate_confirm_token(user, cart_id):
@@ -38,22 +43,19 @@ def generate_confirm_token(user, cart_id):
     return str(refresh.access_token)
 
 
-def initiate_payment(amount, email, user, redirect_url):
-    url = "https://api.flutterwave.com/v3/payments"
-    headers = {
-        "Authorization": f"Bearer {settings.FLW_SEC_KEY}"
-    }
+def initiate_payment(amount, email, user, redirect_url, cart_id):
     first_name = user.first_name
     last_name = user.last_name
     phone_no = user.phone_number
 
     data = {
-        "tx_ref": str(uuid.uuid4()),
+        "tx_ref": payment_reference(cart_id),
         "amount": str(amount),
         "currency": "NGN",
         "redirect_url": redirect_url,
         "meta": {
             "consumer_id": user.id,
+            "cart_id": cart_id,
         },
         "customer": {
             "email": email,
@@ -67,7 +69,7 @@ def initiate_payment(amount, email, user, redirect_url):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_gateway().create_payment(data)
         response_data = response.json()
 
         if response.status_code in [200, 201]:
@@ -86,17 +88,21 @@ def initiate_payment(amount, email, user, redirect_url):
                 "error": response_data.get("message", "An error occurred while initiating payment.")
             }, status=response.status_code)
 
-    except requests.exceptions.RequestException as err:
+    except GatewayUnavailable as err:
+        return Response({"error": str(err)}, status=503)
+    except (GatewayError, requests.exceptions.RequestException) as err:
         return Response({"error": str(err)}, status=500)
 
 
-class ApiProducts(viewsets.ModelViewSet):
+class ApiProducts(CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name', 'description', 'colour', 'material']
     ordering_fields = ['price', 'undiscounted_price']
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    query_budget = {
+        'list': 3, 'retrieve': 2, 'facets': 3, 'create': 10, 'update': 8, 'partial_update': 8, 'destroy': 11
+    }
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -106,9 +112,36 @@ class ApiProducts(viewsets.ModelViewSet):
         return ProductSerializer
 
     def get_queryset(self):
-        return Product.objects.filter(
+        products = Product.objects.filter(
             inventory__gte=1
         ).order_by('-top_deal', 'id')
+        if self.action in ['list', 'retrieve']:
+            # only load the columns behind ?fields= / ?omit=, plus the ones pagination orders by
+            return sparse_queryset(
+                products, self.get_serializer(), required=['top_deal', 'price', 'undiscounted_price']
+            )
+        return products.select_related('category', 'subcategory')
+
+    @action(detail=False, methods=['GET'])
+    def facets(self, request):
+        """
+        Colour and size counts for the current filters. Each kind ignores its
+        own filter, so selecting "red" still shows how many products come in
+        the other colours.
+        """
+        return self.cached_response(request, lambda: Response(self.get_facets(request)))
+
+    def get_facets(self, request):
+        facets = {}
+        for kind in VARIANT_FIELDS:
+            params = request.query_params.copy()
+            params.pop(kind, None)
+            filterset = ProductFilter(params, queryset=self.get_queryset(), request=request)
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors)
+            products = ProductSearchFilter().filter_queryset(request, filterset.qs, self)
+            facets[kind] = variant_facets(kind, products)
+        return facets
 
 
 
@@ -116,28 +149,23 @@ class ApiCart(viewsets.ModelViewSet):
     queryset = Cart.objects.all()
     serializer_class = CartSerializer
     permission_classes = [IsOwnerOrAdmin, IsAuthenticated]
+    query_budget = {'list': 4, 'retrieve': 3, 'create': 4, 'pay': 9, 'confirm_payment': 20}
 
     @action(detail=True, methods=['POST'])
     def pay(self, request, pk=None):
         cart = self.get_object()
-        print(cart)
-        cart_items = CartItems.objects.filter(cart=cart)
         amount = cart.get_total_price()
         email = request.user.email
         user = request.user
         cart_id = str(cart.id)
 
-        for cart_item in cart_items:
-            print("item")
-            product = cart_item.product
-            if product.inventory < cart_item.quantity:
-                return Response(
-                    {
-                        "error": f"Not enough inventory for product '{product.name}'. "
-                                 f"Available: {product.inventory}, Requested: {cart_item.quantity}"
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        # hold the stock while the shopper is on the payment page
+        try:
+            reserve_cart(cart)
+        except EmptyCart as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientInventory as err:
+            return Response({"error": str(err)}, status=status.HTTP_400_BAD_REQUEST)
 
         confirm_token = generate_confirm_token(user, cart_id)
 
@@ -146,7 +174,10 @@ class ApiCart(viewsets.ModelViewSet):
             f"?c_id={cart_id}&token={confirm_token}"
         )
         
-        return initiate_payment(amount, email, user, redirect_url)
+        response = initiate_payment(amount, email, user, redirect_url, cart_id)
+        if response.status_code != 200:
+            release_cart(cart)
+        return response
 
     @action(detail=False, methods=["GET"], permission_classes=[AllowAny])
     def confirm_payment(self, request):
@@ -165,74 +196,32 @@ class ApiCart(viewsets.ModelViewSet):
         if status_from_gateway != "successful":
             return redirect(f"https://asluxuryoriginals.com/checkout/")
 
-        with transaction.atomic():
-            cart = get_object_or_404(Cart, id=cart_id, owner=user)
-            cart_items = CartItems.objects.filter(cart=cart)
+        if not transaction_id:
+            return JsonResponse({"detail": "Missing transaction id."}, status=400)
 
-            if not cart_items.exists():
-                return JsonResponse({"detail": "Cart is empty or invalid."}, status=400)
-
-            order = Order.objects.create(
-                owner=user,
-                address=cart.address,
-                state=cart.state,
-                city=cart.city,
-                postal_code=cart.postal_code,
-                transaction_id=transaction_id
-            )
-
-            order_items = []
-            for cart_item in cart_items:
-                product = cart_item.product
-                if product.inventory < cart_item.quantity:
-                    return JsonResponse(
-                        {
-                            "error": f"Not enough inventory for product '{product.name}'. "
-                                     f"Available: {product.inventory}, Requested: {cart_item.quantity}"
-                        },
-                        status=400
-                    )
-
-                product.inventory -= cart_item.quantity
-                product.save()
-
-                order_items.append(
-                    OrderItem(
-                        owner=user,
-                        order=order,
-                        product=product,
-                        quantity=cart_item.quantity,
-                        price=cart_item.product.price,
-                        size=cart_item.size
-                    )
-                )
-
-            OrderItem.objects.bulk_create(order_items)
-            amount = order.calculate_total_price()
-            order.save()
-
-            # Notify admin
-            email_thread = EmailThread(
-                subject='New Order',
-                message=f'User {user.email} made an order of total amount of ₦{amount}, '
-                        f'order ID is {order.id}. Link to order: '
-                        f'https://asluxuryoriginals.com/orders/',
-                recipient_list=[settings.EMAIL_HOST_USER],
-            )
-            email_thread.start()
-
-            cart_items.delete()
-            cart.delete()
+        try:
+            confirm_order(cart_id, user, transaction_id)
+        except EmptyCart as err:
+            return JsonResponse({"detail": str(err)}, status=400)
+        except InsufficientInventory as err:
+            return JsonResponse({"error": str(err)}, status=400)
 
-            return redirect(f"https://asluxuryoriginals.com/orders/")
+        return redirect(f"https://asluxuryoriginals.com/orders/")
 
     def get_queryset(self):
-        return Cart.objects.filter(owner=self.request.user).select_related('owner').prefetch_related('items')
+        items = CartItems.objects.with_sub_total().select_related('product__category')
+        if self.request.method == 'GET':
+            product = SimpleProductSerializer(context=self.get_serializer_context(), sparse_prefix='product_')
+            items = sparse_queryset(CartItems.objects.with_sub_total(), product, path='product')
+        return Cart.objects.with_totals().filter(owner=self.request.user).select_related('owner').prefetch_related(
+            Prefetch('items', queryset=items)
+        )
 
 
 class ApiCartItem(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = [IsOwnerOrAdmin, IsAuthenticated]
+    query_budget = {'list': 3, 'retrieve': 2, 'create': 6, 'partial_update': 4, 'destroy': 4, 'bulk': 10}
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -242,7 +231,11 @@ class ApiCartItem(viewsets.ModelViewSet):
         return CartItemSerializer
 
     def get_queryset(self):
-        return CartItems.objects.filter(cart_id=self.kwargs['cart_pk'], owner=self.request.user)
+        items = CartItems.objects.filter(cart_id=self.kwargs['cart_pk'], owner=self.request.user)
+        if self.request.method == 'GET':
+            product = SimpleProductSerializer(context=self.get_serializer_context(), sparse_prefix='product_')
+            return sparse_queryset(items.with_sub_total(), product, path='product')
+        return items.select_related('product__category')
 
     def get_serializer_context(self):
         return {
@@ -250,19 +243,55 @@ class ApiCartItem(viewsets.ModelViewSet):
             'cart_id': self.kwargs.get('cart_pk')
         }
 
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request, cart_pk=None):
+        """
+        Apply several add/update/remove operations at once and return the updated cart, e.g.
+        {"operations": [{"op": "add", "product_id": 1, "size": "M", "quantity": 2},
+                        {"op": "remove", "product_id": 2, "size": "L"}]}
+        Updating a line to quantity 0 removes it.
+        """
+        cart = get_object_or_404(Cart, pk=cart_pk, owner=request.user)
+        serializer = BulkCartItemSerializer(data=request.data, context={'request': request, 'cart': cart})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        items = CartItems.objects.with_sub_total().select_related('product__category')
+        cart = Cart.objects.with_totals().prefetch_related(Prefetch('items', queryset=items)).get(pk=cart.pk)
+        return Response(CartSerializer(cart, context={'request': request}).data)
 
-class ApiCategory(viewsets.ModelViewSet):
+
+class ApiCategory(CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly, ]
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
+    query_budget = {'list': 3, 'retrieve': 2, 'tree': 3}
     filter_backends = [DjangoFilterBackend, SearchFilter]
     search_fields = ['title']
 
+    @action(detail=False, methods=['GET'])
+    def tree(self, request):
+        """
+        Every category with its subcategories and in-stock product counts, for navigation.
+        """
+        return self.cached_response(
+            request, lambda: Response(CategoryTreeSerializer(self.get_tree_queryset(), many=True).data)
+        )
+
+    def get_tree_queryset(self):
+        subcategories = SubCategory.objects.annotate(
+            product_count=Count('products_subcategory', filter=Q(products_subcategory__inventory__gte=1))
+        ).order_by('id')
+        return Category.objects.annotate(
+            product_count=Count('products', filter=Q(products__inventory__gte=1))
+        ).prefetch_related(Prefetch('items', queryset=subcategories)).order_by('id')
 
-class ApiSubCategory(viewsets.ModelViewSet):
+
+class ApiSubCategory(CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly, ]
-    queryset = SubCategory.objects.all()
+    queryset = SubCategory.objects.select_related('category')
     filter_backends = [DjangoFilterBackend, SearchFilter]
+    query_budget = {'list': 3, 'retrieve': 2}
     search_fields = ['title']
 
     def get_serializer_class(self):
@@ -279,83 +308,217 @@ class ApiOrder(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['id']
     search_fields = ['id']
+    pagination_class = KeysetPagination
+    query_budget = {'list': 4, 'retrieve': 4, 'partial_update': 7, 'destroy': 10}
 
     def get_permissions(self):
         if self.request.method in ["PATCH", "DELETE"]:
             return [IsAdminUser()]
         return [IsOwner()]
 
+    def compact_items(self):
+        return self.request.method == 'GET' and self.request.query_params.get('items') == 'compact'
+
+    def get_serializer_class(self):
+        # ?items=compact lists each item as product id and name, size, quantity and price
+        if self.compact_items():
+            return CompactOrderSerializer
+        return OrderSerializer
+
     def get_queryset(self):
         user = self.request.user
+        orders = Order.objects.prefetch_related(
+            order_items_prefetch(self.get_serializer_context(), compact=self.compact_items())
+        ).order_by('-placed_at')
         if user.is_staff:
-            return Order.objects.all().order_by('-placed_at')
-        return Order.objects.filter(owner=user).order_by('-placed_at')
+            return orders
+        return orders.filter(owner=user)
 
 
-class DashboardOrderViewSet(ViewSet):
+class CacheStatsViewSet(ViewSet):
     permission_classes = [IsAdminUser]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['id']
 
     def list(self, request):
         """
-        Retrieve all orders, optionally filtered by month, year, or date range.
+        Hit and miss counters for the cached catalog and sales responses, and
+        this process's Flutterwave call latencies.
         """
+        return Response({
+            CATALOG: get_stats(CATALOG),
+            SALES: get_stats(SALES),
+            'gateway': get_gateway().metrics.snapshot(),
+        })
+
+
+class PaymentWebhookViewSet(ViewSet):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = {'create': 1}
+
+    def create(self, request):
+        """
+        Receives Flutterwave webhooks. The event is stored as sent and
+        processed by the payment event workers, so the gateway gets its 200
+        without waiting for the order to be placed.
+        """
+        if not verify_signature(request.headers.get('verif-hash')):
+            return Response({"detail": "Invalid signature."}, status=status.HTTP_401_UNAUTHORIZED)
+        if not isinstance(request.data, dict):
+            return Response({"detail": "Expected a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+
+        record_event(request.data)
+        return Response({"status": "received"}, status=status.HTTP_200_OK)
+
+
+class DashboardOrderViewSet(CachedResponseMixin, ViewSet):
+    permission_classes = [IsAdminUser]
+    cache_namespace = SALES
+    cached_actions = ()
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['id']
+    query_budget = {'list': 3, 'export': 2, 'timeseries': 2, 'summary': 2, 'most_sold_products': 3}
+    export_fields = ['id', 'placed_at', 'transaction_id', 'owner_id', 'owner__email', 'total_price', 'delivered']
+
+    def get_cache_timeout(self):
+        return settings.SALES_CACHE_TIMEOUT
+
+    def get_filtered_orders(self, request):
         orders = Order.objects.all().order_by('-placed_at')
         filters = OrderFilter(request.GET, queryset=orders)
-        filtered_orders = filters.qs
+        if not filters.is_valid():
+            raise ValidationError(filters.errors)
+        return filters.qs
 
-        total_cost = filtered_orders.aggregate(total=Sum('total_price'))['total'] or 0
+    @action(detail=False, methods=["GET"])
+    def timeseries(self, request):
+        """
+        Order count and revenue per `granularity` (day, week or month; day by
+        default) for the same filters as the order list, zero-filled across
+        the selected range.
+        """
+        granularity = request.GET.get('granularity', 'day')
+        if granularity not in TRUNCATE:
+            raise ValidationError({"granularity": f"Choose one of: {', '.join(TRUNCATE)}."})
+
+        filters = OrderFilter(request.GET, queryset=Order.objects.all())
+        if not filters.is_valid():
+            raise ValidationError(filters.errors)
+        start, end = filter_bounds(filters.form.cleaned_data)
 
-        serializer = DashboardOrderSerializer(filtered_orders, many=True)
+        try:
+            series = order_timeseries(filters.qs, granularity, start, end)
+        except ValueError as err:
+            raise ValidationError({"granularity": str(err)})
+        return Response({
+            "granularity": granularity,
+            "results": series,
+        })
+
+    def get_totals(self, request, orders):
+        """
+        Order count and total cost of the filtered orders. Date-only filters
+        are answered from the daily rollups, one row per day.
+        """
+        if 'id' in request.GET:
+            totals = orders.aggregate(order_count=Count('id'), total=Sum('total_price'))
+        else:
+            days = DailySalesFilter(request.GET, queryset=DailySales.objects.all()).qs
+            totals = days.aggregate(order_count=Sum('order_count'), total=Sum('revenue'))
+        return totals['order_count'] or 0, totals['total'] or 0
+
+    def list(self, request):
+        """
+        Retrieve orders, optionally filtered by month, year, or date range, a
+        page at a time. Follow `next`/`previous` for the other pages.
+        """
+        filtered_orders = self.get_filtered_orders(request)
+        order_count, total_cost = self.get_totals(request, filtered_orders)
+
+        paginator = DashboardOrderPagination()
+        page = paginator.paginate_queryset(
+            filtered_orders.only('id', 'placed_at', 'owner_id', 'total_price'), request, view=self
+        )
+        serializer = DashboardOrderSerializer(page, many=True)
         return Response({
             "orders": serializer.data,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "order_count": order_count,
             "total_cost": total_cost
         })
 
+    @action(detail=False, methods=["GET"])
+    def export(self, request):
+        """
+        Download every order matching the filters as CSV (`?type=csv`, the
+        default) or NDJSON (`?type=ndjson`), streamed row by row. The filtered
+        order count and total cost are sent in the X-Order-Count and
+        X-Total-Cost headers.
+        """
+        export_format = request.GET.get('type', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({"type": f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+
+        filtered_orders = self.get_filtered_orders(request)
+        order_count, total_cost = self.get_totals(request, filtered_orders)
+
+        response = streaming_export(
+            filtered_orders, self.export_fields, export_format, 'orders', keys=('placed_at', 'id')
+        )
+        response['X-Order-Count'] = order_count
+        response['X-Total-Cost'] = total_cost
+        return response
+
     @action(detail=False, methods=["GET"], url_path='summary')
     def summary(self, request):
         """
-        Retrieve a summary of total orders and revenue.
+        Retrieve a summary of total orders and revenue, read from the daily rollups.
         """
-        total_orders = Order.objects.count()
-        total_revenue = Order.objects.aggregate(total=Sum('total_price'))['total'] or 0
+        totals = DailySales.objects.aggregate(total_orders=Sum('order_count'), total_revenue=Sum('revenue'))
 
         return Response({
-            "total_orders": total_orders,
-            "total_revenue": total_revenue
+            "total_orders": totals['total_orders'] or 0,
+            "total_revenue": totals['total_revenue'] or 0
         })
 
     @action(detail=False, methods=["GET"], url_path='most-sold-products')
     def most_sold_products(self, request):
         """
         Retrieve the list of most sold products with quantities and total sales price.
-        Supports filtering by revenue generated.
+        Supports ordering by revenue generated (`order_by=revenue`), the top
+        `limit` products only, and the month/year/start_date/end_date filters.
+        Cached until the next order.
         """
+        return self.cached_response(request, lambda: Response(self.get_most_sold(request)))
+
+    def get_most_sold(self, request):
+        limit = request.GET.get('limit')
+        if limit is not None and (not limit.isdigit() or int(limit) < 1):
+            raise ValidationError({"limit": "Must be a positive integer."})
 
+        filters = DailySalesFilter(request.GET, queryset=DailyProductSales.objects.all())
+        if not filters.is_valid():
+            raise ValidationError(filters.errors)
+        sales = filters.qs
+
+        ordering = '-total_revenue' if request.GET.get('order_by') == 'revenue' else '-total_quantity'
         products_data = (
-            OrderItem.objects
-            .values(product_name=F('product__name'), product_identifier=F('product__id'))
+            sales
+            .values(product_name=F('product__name'), product_identifier=F('product_id'))
             .annotate(
                 total_quantity=Sum('quantity'),
-                total_revenue=Coalesce(
-                    Sum(
-                        Cast(F('quantity'), DecimalField()) * Cast(F('price'), DecimalField())
-                    ),
-                    Value(0),
-                    output_field=DecimalField()
-                ),
+                total_revenue=Coalesce(Sum('revenue'), Value(0), output_field=DecimalField()),
             )
             .filter(total_quantity__gt=0)
-            .order_by('-total_quantity')
+            .order_by(ordering, 'product_id')
         )
+        if limit is not None:
+            products_data = products_data[:int(limit)]
 
-        if request.GET.get('order_by') == 'revenue':
-            products_data = products_data.order_by('-total_revenue')
-
-        total_revenue = sum([item['total_revenue'] for item in products_data])
+        # over every product in the range, not just the top `limit`
+        total_revenue = sales.aggregate(total=Sum('revenue'))['total'] or 0
 
-        return Response({
+        return {
             "most_sold_products": list(products_data),
             "total_revenue": total_revenue,
-        })
\ No newline at end of file
+        }
\ No newline at end of file
@@ -1,6 +1,6 @@
 from customuser.models import User
 from rest_framework import serializers
-from api.serializers import OrderSerializer
+from api.cache import get_order_summary
 
 
 class ForgotPasswordRequestSerializer(serializers.Serializer):
@@ -24,12 +24,21 @@ class UserProfileSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True, required=False)
 
 
+class OrderSummarySerializer(serializers.Serializer):
+    order_count = serializers.IntegerField()
+    lifetime_spend = serializers.DecimalField(max_digits=12, decimal_places=2)
+    last_order_at = serializers.DateTimeField(allow_null=True)
+
+
 class ViewUserProfileSerializer(serializers.ModelSerializer):
-    order_history = OrderSerializer(many=True, read_only=True)
+    order_summary = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'first_name', 'last_name', 'email', 'phone_number', 'order_history']
+        fields = ['id', 'first_name', 'last_name', 'email', 'phone_number', 'order_summary']
+
+    def get_order_summary(self, user):
+        return OrderSummarySerializer(get_order_summary(user)).data
 
 
 class PasswordChangeRequestSerializer(serializers.Serializer):
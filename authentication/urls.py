@@ -27,6 +27,7 @@ urlpatterns = [
          PasswordChangeRequestViewSet.as_view({'post': 'verify_password_change'}), name='verify_password_change'),
     # profile
     path('profile/', UserProfileViewSet.as_view({'get': 'retrieve'}), name='user_profile'),
+    path('profile/orders/', UserProfileViewSet.as_view({'get': 'orders'}), name='user_profile_orders'),
     path('profile/request-email-change/', UserProfileViewSet.as_view({'post': 'request_email_change'}),
          name='request_email_change'),
     path('profile/resend-email-change-otp/', UserProfileViewSet.as_view({'post': 'resend_email_change_otp'}),
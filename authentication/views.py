@@ -1,5 +1,4 @@
 from django.conf import settings
-from django.core.mail import send_mail
 import random
 import datetime
 from django.utils import timezone
@@ -8,11 +7,15 @@ from rest_framework.decorators import action
 from django.contrib.auth.hashers import make_password
 from rest_framework.exceptions import AuthenticationFailed
 from customuser.models import User
+from customuser.authentication import invalidate_cached_user
+from ecommerce.models import Order
+from api.pagination import KeysetPagination
+from api.serializers import OrderSerializer, CompactOrderSerializer, order_items_prefetch
 from .serializers import (UserSignupSerializer, LoginSerializer, PasswordChangeRequestSerializer, \
                           UserProfileSerializer, ForgotPasswordRequestSerializer, UserSignupSerializerResendOTP,
                           UserSignupSerializerOTP, ViewUserProfileSerializer)
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
-from .utils import EmailThread
+from api.outbox import queue_mail
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import EmailChangeRequest, PasswordChangeRequest, ForgotPasswordRequest, NameChangeRequest
@@ -35,7 +38,7 @@ class ForgotPasswordViewSet(viewsets.ModelViewSet):
 
         reset_url = f"https://asluxeryoriginals.pythonanywhere.com/auth/forgot-password/set-new-password/?email={email}"
         ForgotPasswordRequest.objects.create(user=user)
-        send_mail(
+        queue_mail(
             subject='Password Reset Request',
             message=f"Click the following link to reset your password: {reset_url}. This link will expire in 10 minutes.",
             recipient_list=[email],
@@ -72,7 +75,7 @@ class ForgotPasswordViewSet(viewsets.ModelViewSet):
         ForgotPasswordRequest.objects.filter(user=user).delete()
         otp = random.randint(100000, 999999)
 
-        send_mail(
+        queue_mail(
             subject='Forgot Password OTP',
             message=f"Your OTP for password reset is: {otp}. It will expire in 5 minutes.",
             recipient_list=[email],
@@ -148,7 +151,7 @@ class ForgotPasswordViewSet(viewsets.ModelViewSet):
         forgot_password_request.save()
 
         # Send the new OTP to the user
-        send_mail(
+        queue_mail(
             subject='Forgot Password OTP - Resent',
             message=f"Your new OTP for password reset is: {otp}. It will expire in 5 minutes.",
             recipient_list=[email],
@@ -164,15 +167,32 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     """
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {'retrieve': 2, 'orders': 4}
 
     def retrieve(self, request, *args, **kwargs):
         """
-        Returns the profile of the currently authenticated user along with their orders.
+        Returns the profile of the currently authenticated user with a summary of their orders.
         """
-        user = request.user
-        serializer = ViewUserProfileSerializer(user, context={'request': request})
+        serializer = ViewUserProfileSerializer(request.user, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def orders(self, request):
+        """
+        The user's order history, newest first and paginated. `?items=compact`
+        lists each item as product id and name, size, quantity and price.
+        """
+        compact = request.query_params.get('items') == 'compact'
+        context = self.get_serializer_context()
+        orders = Order.objects.filter(owner=request.user).prefetch_related(
+            order_items_prefetch(context, compact=compact)
+        ).order_by('-placed_at')
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer_class = CompactOrderSerializer if compact else OrderSerializer
+        return paginator.get_paginated_response(serializer_class(page, many=True, context=context).data)
+
     @action(detail=False, methods=['post'], url_path='request-email-change')
     def request_email_change(self, request):
         """
@@ -203,7 +223,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             otp = random.randint(100000, 999999)
             EmailChangeRequest.objects.create(user=user, new_email=new_email, otp=otp)
 
-        send_mail(
+        queue_mail(
             subject='Email Change OTP',
             message=f"Your OTP is: {otp}",
             recipient_list=[new_email],
@@ -233,7 +253,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         email_change_request.created_at = timezone.now()
         email_change_request.save()
 
-        send_mail(
+        queue_mail(
             subject='Resend Email Change OTP',
             message=f"Your new OTP is: {otp}",
             recipient_list=[email_change_request.new_email],
@@ -271,7 +291,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         email_change_request.delete()
 
         # Send confirmation email
-        send_mail(
+        queue_mail(
             subject='Email Change Confirmation',
             message="Your email address has been successfully changed.",
             recipient_list=[user.email],
@@ -341,7 +361,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         user.save()
         name_change_request.delete()
 
-        send_mail(
+        queue_mail(
             subject='Profile Change Confirmation',
             message="Your profile has been successfully updated.",
             recipient_list=[user.email],
@@ -397,7 +417,7 @@ class PasswordChangeRequestViewSet(viewsets.ModelViewSet):
         PasswordChangeRequest.objects.filter(user=user).delete()
         otp = random.randint(100000, 999999)
 
-        send_mail(
+        queue_mail(
             subject='Password Change OTP',
             message=f"Your OTP for password change is: {otp}",
             recipient_list=[user.email],
@@ -424,7 +444,7 @@ class PasswordChangeRequestViewSet(viewsets.ModelViewSet):
         password_change_request.created_at = timezone.now()
         password_change_request.save()
 
-        send_mail(
+        queue_mail(
             subject='Password Change OTP - Resent',
             message=f"Your new OTP for password change is: {otp}",
             recipient_list=[user.email],
@@ -469,7 +489,7 @@ class PasswordChangeRequestViewSet(viewsets.ModelViewSet):
                 token.blacklist()
             except Exception as e:
                 raise AuthenticationFailed('Refresh token is invalid or expired.')
-        send_mail(
+        queue_mail(
             subject='Password changed successfully',
             message=f'Password changed successfully and  you have been logged out. \n Login with your new password',
             recipient_list=[request.user.email],
@@ -505,7 +525,7 @@ class UserSignupViewSet(viewsets.ViewSet):
                 user.otp_created_at = now()
                 user.save()
 
-                send_mail(
+                queue_mail(
                     subject='Verify your email',
                     message=f'Your OTP is: {otp}',
                     recipient_list=[email],
@@ -529,7 +549,7 @@ class UserSignupViewSet(viewsets.ViewSet):
             otp_created_at=now()
         )
 
-        send_mail(
+        queue_mail(
             subject='Verify your email',
             message=f'Your OTP is: {otp}',
             recipient_list=[email],
@@ -565,7 +585,7 @@ class UserSignupViewSet(viewsets.ViewSet):
         user.otp = None
         user.save()
 
-        send_mail(
+        queue_mail(
             subject='Signup successful',
             message=f'You have finished the signup verification for asluxuryoriginals.com !',
             recipient_list=[email],
@@ -602,7 +622,7 @@ class UserSignupViewSet(viewsets.ViewSet):
         user.otp_created_at = now()
         user.save()
 
-        send_mail(
+        queue_mail(
             subject='Resend OTP',
             message=f'Your OTP is: {otp}',
             recipient_list=[email],
@@ -643,7 +663,7 @@ class UserLoginViewSet(viewsets.ViewSet):
         access_token = str(refresh.access_token)
 
         # Send login success email
-        send_mail(
+        queue_mail(
             subject='Login Successful',
             message=f'Your login to asluxuryoriginals.com was successful.',
             recipient_list=[email],
@@ -674,6 +694,7 @@ class LogoutViewSet(viewsets.ViewSet):
             # Invalidate the refresh token
             token = RefreshToken(refresh_token)
             token.blacklist()  # This will invalidate the refresh token
+            invalidate_cached_user(request.user.pk)
 
             return Response({"detail": "Logout successful."}, status=status.HTTP_200_OK)
         except Exception as e:
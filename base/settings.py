@@ -67,8 +67,16 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'api.middleware.QueryBudgetMiddleware',
 ]
 
+# Query budgets: views declare `query_budget = {action: max_queries}` and the
+# middleware above logs requests that go over it or repeat the same statement
+# QUERY_BUDGET_REPEAT_THRESHOLD times. Set QUERY_BUDGET_STRICT=True (e.g. in
+# test runs) to raise instead of logging.
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT") == "True"
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+
 ROOT_URLCONF = 'base.urls'
 
 TEMPLATES = [
@@ -164,15 +172,69 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cache
+# The default file-based cache is shared by every worker process on the host,
+# which keeps cache invalidation consistent without running Redis. Set
+# CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache for a
+# single-process setup.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", os.path.join(BASE_DIR, 'tmp', 'cache')),
+        'OPTIONS': {
+            # catalog responses plus per-user auth and order summary entries; once
+            # full, every set() scans the directory and culls a third at random
+            'MAX_ENTRIES': int(os.getenv("CACHE_MAX_ENTRIES", 20000)),
+        },
+    }
+}
+CATALOG_CACHE_TIMEOUT = 60 * 60
+# cached dashboard sales reports, also dropped whenever an order is placed
+SALES_CACHE_TIMEOUT = 15 * 60
+# per-user order count/spend shown on the profile, dropped when the user orders
+ORDER_SUMMARY_CACHE_TIMEOUT = 24 * 60 * 60
+# user behind a JWT, see customuser/authentication.py; dropped when the user is saved
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+
+# Product search, see api/search.py. api.search.InMemorySearchBackend keeps the
+# index in-process for tests and local development, built on the first search.
+PRODUCT_SEARCH_BACKEND = os.getenv("PRODUCT_SEARCH_BACKEND", 'api.search.DatabaseSearchBackend')
+
+# Threads per process that resize uploaded product images, see api/images.py
+IMAGE_VARIANT_WORKERS = 2
+
+# Seconds a cart's stock stays held after /pay/ while the shopper is on the
+# payment page. Expired holds are cleared by `release_expired_reservations`.
+INVENTORY_RESERVATION_TIMEOUT = 30 * 60
+
 AUTH_USER_MODEL = 'customuser.User'
 FLW_SEC_KEY = os.getenv("FLW_SEC_KEY")
+FLW_BASE_URL = os.getenv("FLW_BASE_URL", "https://api.flutterwave.com/v3")
+# Flutterwave client, see api/gateway.py. Timeouts are in seconds; the circuit
+# opens after FLW_CIRCUIT_FAILURES consecutive failures for FLW_CIRCUIT_RESET seconds.
+FLW_CONNECT_TIMEOUT = 3.05
+FLW_READ_TIMEOUT = 10
+FLW_MAX_RETRIES = 2
+FLW_CIRCUIT_FAILURES = 5
+FLW_CIRCUIT_RESET = 30
+# Secret hash set on the Flutterwave dashboard, sent back in the verif-hash
+# header of webhooks. Events are processed by PAYMENT_EVENT_WORKERS threads
+# per process and by `process_payment_events`, see api/payments.py. A failed
+# event is retried after about PAYMENT_EVENT_RETRY_DELAY seconds, doubling each
+# time, up to PAYMENT_EVENT_MAX_ATTEMPTS tries. Workers hold a claimed batch
+# for PAYMENT_EVENT_LEASE seconds.
+FLW_WEBHOOK_HASH = os.getenv("FLW_WEBHOOK_HASH")
+PAYMENT_EVENT_WORKERS = 2
+PAYMENT_EVENT_MAX_ATTEMPTS = 5
+PAYMENT_EVENT_RETRY_DELAY = 30
+PAYMENT_EVENT_LEASE = 5 * 60
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'customuser.authentication.CachedJWTAuthentication',
     ],
 }
 
@@ -214,6 +276,16 @@ EMAIL_PORT = 465
 EMAIL_HOST_USER = os.getenv("EMAIL")
 EMAIL_HOST_PASSWORD = os.getenv("PASSWORD")
 DEFAULT_FROM_EMAIL = os.getenv("EMAIL")
+# Outgoing mail is queued in the outbox and sent by EMAIL_OUTBOX_WORKERS threads
+# per process and by `send_queued_emails`, see api/outbox.py. A failed message is
+# retried after about EMAIL_OUTBOX_RETRY_DELAY seconds, doubling each time, and
+# given up on after EMAIL_OUTBOX_MAX_ATTEMPTS. Workers hold a claimed batch for
+# EMAIL_OUTBOX_LEASE seconds.
+EMAIL_OUTBOX_WORKERS = 1
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_LEASE = 5 * 60
 
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -1,6 +1,13 @@
 # yourapp/authentication.py
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.auth import get_user_model
 
 
@@ -22,3 +29,51 @@ class EmailAuthentication(BaseAuthentication):
             raise AuthenticationFailed('Invalid password.')
 
         return (user, None)
+
+
+# the columns request.user is read for on authenticated endpoints; anything
+# else is loaded from the database on first access
+CACHED_USER_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'phone_number',
+    'is_active', 'is_staff', 'is_superuser', 'is_verified',
+)
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the token's user in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds instead of selecting it on every
+    request. Cached users are built with only CACHED_USER_FIELDS loaded.
+    The entry is dropped whenever the user is saved or logs out.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_cache_key(user_id)
+        data = cache.get(key)
+        if data is None:
+            user = super().get_user(validated_token)
+            cache.set(key, {field: getattr(user, field) for field in CACHED_USER_FIELDS},
+                      settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        User = get_user_model()
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in data]
+        # loaded from a real alias, so save() writes just these fields instead
+        # of fetching the deferred ones and rewriting the whole row
+        user = User.from_db(router.db_for_read(User), fields, [data[field] for field in fields])
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
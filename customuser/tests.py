@@ -1,3 +1,65 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from .authentication import CachedJWTAuthentication, user_cache_key
+from .models import User
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'shopper@example.com', 'secret-pass', first_name='Ada', is_verified=True,
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+        self.token = self.refresh.access_token
+
+    def get_user(self):
+        return CachedJWTAuthentication().get_user(self.token)
+
+    def test_user_is_read_from_the_cache_after_the_first_request(self):
+        with self.assertNumQueries(1):
+            self.get_user()
+        with self.assertNumQueries(0):
+            user = self.get_user()
+
+        self.assertEqual(
+            (user.pk, user.email, user.first_name, user.is_staff), (self.user.pk, self.user.email, 'Ada', False)
+        )
+        self.assertEqual(user._state.db, 'default')
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_saving_a_cached_user_updates_only_the_loaded_fields(self):
+        self.get_user()
+        user = self.get_user()
+        user.first_name = 'Grace'
+        with self.assertNumQueries(1):
+            user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Grace')
+        self.assertTrue(self.user.check_password('secret-pass'))
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.assertFalse(self.get_user().is_staff)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.is_staff = True
+        user.save()
+
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.get_user().is_staff)
+
+    def test_logout_drops_the_cached_copy(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'JWT {self.token}')
+        self.assertEqual(client.get('/auth/profile/').status_code, 200)
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+
+        response = client.post('/auth/logout/', {'refresh_token': str(self.refresh)}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
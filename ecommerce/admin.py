@@ -9,3 +9,8 @@ admin.site.register(CartItems)
 admin.site.register(Order)
 admin.site.register(OrderItem)
 admin.site.register(SubCategory)
+admin.site.register(InventoryReservation)
+admin.site.register(PaymentEvent)
+admin.site.register(OutboundEmail)
+admin.site.register(DailySales)
+admin.site.register(DailyProductSales)
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Sum, Count, Max, OuterRef, Subquery, Value, ExpressionWrapper
+from django.db.models.functions import Coalesce
 from autoslug import AutoSlugField
 from django.conf import settings
 from django.utils.timezone import now
@@ -62,10 +64,85 @@ class Product(models.Model):
     image4 = models.ImageField(upload_to='products/images/', blank=True, null=True)
     image5 = models.ImageField(upload_to='products/images/', blank=True, null=True)
 
+    class Meta:
+        # composite indexes backing the listing orderings, used by keyset pagination seeks
+        indexes = [
+            models.Index(fields=['-top_deal', 'id'], name='product_top_deal_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['undiscounted_price', 'id'], name='product_undisc_price_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ProductSearchTerm(models.Model):
+    """
+    Inverted index row: one term found in a product's searchable fields and
+    its weight for that product. Maintained by api.search.DatabaseSearchBackend.
+    """
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        # term leads so both exact and prefix lookups are index range scans
+        unique_together = ('term', 'product')
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id} ({self.weight})"
+
+
+class ProductVariantValue(models.Model):
+    """
+    One normalized colour or size a product comes in, mirrored from the
+    Product.colour/size JSON by api.variants so it can be filtered and
+    counted through an index.
+    """
+    COLOUR = 'colour'
+    SIZE = 'size'
+    KIND_CHOICES = [(COLOUR, 'Colour'), (SIZE, 'Size')]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variant_values')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.CharField(max_length=100)
+    label = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('kind', 'value', 'product')
+
+    def __str__(self):
+        return f"{self.kind}: {self.label} ({self.product_id})"
+
+
+def cart_line_total(prefix=''):
+    """
+    quantity x product price of a cart item, evaluated by the database.
+    """
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}product__price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate each cart with `grand_total`, summed in one correlated subquery.
+        """
+        totals = CartItems.objects.filter(
+            cart=OuterRef('pk')
+        ).order_by().values('cart').annotate(total=Sum(cart_line_total())).values('total')
+        return self.annotate(grand_total=Coalesce(
+            Subquery(totals), Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ))
+
+
+class CartItemsQuerySet(models.QuerySet):
+    def with_sub_total(self):
+        return self.annotate(sub_total=cart_line_total())
+
+
 class Cart(models.Model):
     address = models.CharField(max_length=200)
     city = models.CharField(max_length=200)
@@ -82,12 +159,16 @@ class Cart(models.Model):
         populate_from=generate_cart_slug, db_index=True
     )
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Cart {self.id} ({self.slug})"
 
     def get_total_price(self):
-        cart_items = self.items.all()  # Using related_name='items'
-        return sum(item.product.price * item.quantity for item in cart_items)
+        # carts loaded through Cart.objects.with_totals() already carry the total
+        if hasattr(self, 'grand_total'):
+            return self.grand_total
+        return self.items.aggregate(total=Sum(cart_line_total()))['total'] or 0
 
 
 class CartItems(models.Model):
@@ -100,13 +181,92 @@ class CartItems(models.Model):
         populate_from=generate_cart_item_slug, db_index=True
     )
 
+    objects = CartItemsQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product', 'size'], name='unique_cart_product_size'),
+        ]
+
     def __str__(self):
         return f"CartItem #{self.product.name} ({self.slug})"
 
 
+class InventoryReservationQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(expires_at__gt=now())
+
+    def expired(self):
+        return self.filter(expires_at__lte=now())
+
+
+class InventoryReservation(models.Model):
+    """
+    Stock held for a cart while its owner is on the payment page. Held units
+    count against the product's inventory until they expire or the payment
+    is confirmed.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    size = models.CharField(max_length=200)
+    quantity = models.PositiveSmallIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = InventoryReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # held stock of a product is summed over its unexpired rows
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_exp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} ({self.size}) held for cart {self.cart_id}"
+
+
+def order_line_total(prefix=''):
+    """
+    quantity x price an order item was sold at, evaluated by the database.
+    """
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items_total(self):
+        """
+        Annotate each order with `items_total`, its items summed in one
+        correlated subquery, to check the stored total_price against.
+        """
+        totals = OrderItem.objects.filter(
+            order=OuterRef('pk')
+        ).order_by().values('order').annotate(total=Sum(order_line_total())).values('total')
+        return self.annotate(items_total=Coalesce(
+            Subquery(totals), Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ))
+
+    def summary(self):
+        """
+        Order count, total spend and latest order date of the queryset, in
+        one aggregate.
+        """
+        return self.aggregate(
+            order_count=Count('id'),
+            lifetime_spend=Coalesce(
+                Sum('total_price'), Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            last_order_at=Max('placed_at'),
+        )
+
+
 class Order(models.Model):
     placed_at = models.DateTimeField(auto_now_add=True)
-    transaction_id = models.CharField(max_length=200)
+    # orders placed before this was unique may repeat a payment; resolve them
+    # with `manage.py dedupe_order_transactions --fix` before migrating
+    transaction_id = models.CharField(max_length=200, unique=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="order_history")
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     address = models.CharField(max_length=200)
@@ -117,8 +277,25 @@ class Order(models.Model):
     delivered_on = models.DateTimeField(blank=True, null=True)
     slug = AutoSlugField(populate_from=generate_order_slug, db_index=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-placed_at', '-id'], name='order_placed_at_id_idx'),
+            # a shopper's own history, newest first
+            models.Index(fields=['owner', '-placed_at', '-id'], name='order_owner_placed_at_idx'),
+        ]
+
     def calculate_total_price(self):
-        self.total_price = sum(item.quantity * item.price for item in self.items.all())
+        self.total_price = self.items.aggregate(total=Sum(order_line_total()))['total'] or 0
+        return self.total_price
+
+    def update_total_price(self):
+        """
+        Store the total of the order's items. Called once the items exist;
+        later saves (e.g. marking the order delivered) leave the total alone.
+        """
+        Order.objects.filter(pk=self.pk).update(total_price=self.calculate_total_price())
         return self.total_price
 
     def save(self, *args, **kwargs):
@@ -126,7 +303,6 @@ class Order(models.Model):
             self.delivered_on = now()
         elif not self.delivered:
             self.delivered_on = None
-        self.calculate_total_price()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -151,3 +327,111 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name} @ ₦ {self.price} (Order)"
+
+
+class PaymentEvent(models.Model):
+    """
+    A webhook event as received from the payment gateway. Rows are only ever
+    inserted; processing just stamps the outcome columns.
+    """
+    PENDING = 'pending'
+    PROCESSED = 'processed'
+    DUPLICATE = 'duplicate'
+    IGNORED = 'ignored'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSED, 'Processed'),
+        (DUPLICATE, 'Duplicate'),
+        (IGNORED, 'Ignored'),
+        (FAILED, 'Failed'),
+    ]
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    event_type = models.CharField(max_length=100)
+    transaction_id = models.CharField(max_length=200, blank=True, db_index=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # pending events are not picked up before this; pushed back while a worker holds the event and after failures
+    next_attempt_at = models.DateTimeField(default=now)
+    error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # workers claim the pending events that are due
+            models.Index(fields=['status', 'next_attempt_at'], name='payment_event_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.transaction_id} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be sent. Views insert the row in their own
+    transaction and return; workers deliver it and stamp the outcome.
+    Messages that keep failing are kept as DEAD for inspection.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # pending rows are not picked up before this; pushed back while a worker holds the row and after failures
+    next_attempt_at = models.DateTimeField(default=now)
+    error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # workers claim the pending messages that are due
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
+
+
+class DailySales(models.Model):
+    """
+    Orders and revenue per calendar day (in TIME_ZONE), kept up to date as
+    orders are placed so the dashboard reads one row per day instead of
+    every order.
+    """
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.order_count} orders, ₦{self.revenue}"
+
+
+class DailyProductSales(models.Model):
+    """
+    Units sold and revenue of one product on one day.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.quantity} x {self.product_id}"